@@ -9,7 +9,9 @@ import json
 import time
 import shutil
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils.data_manager import DataManager
 
 class DataSyncCore:
     """核心数据同步器"""
@@ -23,6 +25,7 @@ class DataSyncCore:
         #if os.path.exists(self.data_dir):
         #    shutil.rmtree(self.data_dir)
         os.makedirs(self.data_dir, exist_ok=True)
+        self.manager = DataManager(self.data_dir)
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -108,6 +111,13 @@ class DataSyncCore:
     
     def sync_single_lof(self, code: str) -> Dict[str, Any]:
         """同步单个LOF，包括更新之前为"-"的溢价率数据"""
+        result, combined_df = self._merge_single_lof(code)
+        if combined_df is not None and not self.manager.save_lof_data(code, combined_df):
+            result['status'] = 'failed'
+        return result
+    
+    def _merge_single_lof(self, code: str) -> Tuple[Dict[str, Any], Optional[pd.DataFrame]]:
+        """拉取并合并单个LOF，返回 (结果, 待写入的数据)；无需写入时数据为 None"""
         existing_df = self.load_existing_data(code)
         api_df = self.fetch_api_data(code)
         
@@ -119,7 +129,7 @@ class DataSyncCore:
                 'new': 0,
                 'updated': 0,
                 'total': len(existing_df)
-            }
+            }, None
         
         if existing_df.empty:
             # 全新数据
@@ -160,9 +170,6 @@ class DataSyncCore:
         if new_records > 0 or updated_records > 0:
             combined_df = combined_df.sort_values('price_dt').reset_index(drop=True)
             
-            filename = f"{self.data_dir}/lof_{code}.csv"
-            combined_df.to_csv(filename, index=False, encoding='utf-8-sig')
-            
             return {
                 'code': code,
                 'status': 'updated',
@@ -171,7 +178,7 @@ class DataSyncCore:
                 'updated': updated_records,
                 'total': len(combined_df),
                 'latest': combined_df['price_dt'].max().strftime('%Y-%m-%d')
-            }
+            }, combined_df
         
         return {
             'code': code,
@@ -180,18 +187,19 @@ class DataSyncCore:
             'new': 0,
             'updated': 0,
             'total': len(existing_df)
-        }
+        }, None
     
     def sync_all(self) -> Dict[str, List[Dict]]:
         """同步所有LOF"""
         codes = self.load_lof_codes()
         results = {'updated': [], 'no_change': [], 'failed': []}
+        pending = {}
         
         for code in codes:
             try:
-                result = self.sync_single_lof(code)
+                result, combined_df = self._merge_single_lof(code)
                 if result['status'] == 'updated':
-                    results['updated'].append(result)
+                    pending[code] = (result, combined_df)
                 elif result['status'] == 'no_change':
                     results['no_change'].append(result)
                 else:
@@ -199,4 +207,12 @@ class DataSyncCore:
             except Exception as e:
                 results['failed'].append({'code': code, 'error': str(e)})
         
+        # 各文件相互独立，合并完成后并行写入
+        saved = self.manager.save_many((code, df) for code, (_, df) in pending.items())
+        for code, (result, _) in pending.items():
+            if saved[code]:
+                results['updated'].append(result)
+            else:
+                results['failed'].append({**result, 'status': 'failed'})
+        
         return results
\ No newline at end of file
@@ -49,7 +49,7 @@ class PremiumAnalyzer:
         cutoff_date = datetime.now() - timedelta(days=days)
         
         # 获取最近days天的数据
-        recent_data = df[df['price_dt'] >= cutoff_date].copy()
+        recent_data = df[df['price_dt'] >= cutoff_date]
         
         if recent_data.empty:
             return {}
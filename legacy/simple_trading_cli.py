@@ -45,7 +45,7 @@ class SimpleTradingAnalyzer:
         results = {}
         for days in [7, 14, 21]:
             cutoff = datetime.now() - timedelta(days=days)
-            recent = df[df['price_dt'] >= cutoff].copy()
+            recent = df[df['price_dt'] >= cutoff]
             
             if not recent.empty:
                 avg = recent['discount_rt'].mean()
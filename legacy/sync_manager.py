@@ -6,7 +6,7 @@ import asyncio
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 from pathlib import Path
 
@@ -29,19 +29,36 @@ class SyncManager:
         self.sync_state_file = Path(self.config.DATA_DIR) / "sync_state.json"
         self.last_sync = self._load_sync_state()
         
+        # Parsed copies of the ISO timestamps in last_sync
+        self._last_inc_dt = self._parse_sync_time("last_incremental_sync")
+        self._last_full_dt = self._parse_sync_time("last_full_sync")
+        
+    def _parse_sync_time(self, key: str) -> Optional[datetime]:
+        """Parse an ISO timestamp from the sync state, if present"""
+        value = self.last_sync.get(key)
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            self.logger.error(f"Invalid {key} in sync state: {value}")
+            return None
+    
     def _load_sync_state(self) -> Dict[str, Any]:
         """Load last synchronization state"""
         if self.sync_state_file.exists():
             try:
                 with open(self.sync_state_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    state = json.load(f)
+                state["failed_codes"] = set(state.get("failed_codes", []))
+                return state
             except Exception as e:
                 self.logger.error(f"Error loading sync state: {e}")
         
         return {
             "last_full_sync": None,
             "last_incremental_sync": None,
-            "failed_codes": [],
+            "failed_codes": set(),
             "success_count": 0,
             "total_records": 0
         }
@@ -49,11 +66,38 @@ class SyncManager:
     def _save_sync_state(self):
         """Save synchronization state"""
         try:
+            state = dict(self.last_sync)
+            state["failed_codes"] = sorted(state.get("failed_codes", ()))
             with open(self.sync_state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.last_sync, f, ensure_ascii=False, indent=2)
+                json.dump(state, f, ensure_ascii=False, indent=2)
         except Exception as e:
             self.logger.error(f"Error saving sync state: {e}")
     
+    async def _sync_codes(self, scraper: LOFScraper, codes: list, days_back: int) -> list:
+        """Sync codes concurrently; returns one record count (or exception) per code"""
+        semaphore = asyncio.Semaphore(self.config.MAX_CONCURRENT_REQUESTS)
+        
+        async def sync_single(code: str) -> int:
+            async with semaphore:
+                return await scraper.sync_lof_data(code, days_back)
+        
+        return await asyncio.gather(*[sync_single(code) for code in codes], return_exceptions=True)
+    
+    def _aggregate_results(self, results: Dict[str, Any], codes: list, result_counts: list):
+        """Fill sync results from the per-code counts returned by _sync_codes"""
+        counts = [c for c in result_counts if isinstance(c, int)]
+        results["successful_codes"] = sum(1 for c in counts if c > 0)
+        results["total_records"] = sum(counts)
+        
+        for code, count in zip(codes, result_counts):
+            # gather 也可能返回 CancelledError 等 BaseException，非整数一律按失败处理
+            if not isinstance(count, int):
+                self.logger.error(f"Failed to sync {code}: {count!r}")
+                results["failed_codes"].add(code)
+                results["errors"].append({"code": code, "error": str(count) or type(count).__name__})
+            elif count <= 0:
+                results["failed_codes"].add(code)
+    
     async def incremental_sync(self, days_back: int = 1) -> Dict[str, Any]:
         """Perform incremental sync for recent missing data"""
         self.logger.info("Starting incremental sync...")
@@ -66,28 +110,19 @@ class SyncManager:
             "start_time": start_time.isoformat(),
             "total_codes": len(lof_codes),
             "successful_codes": 0,
-            "failed_codes": [],
+            "failed_codes": set(),
             "total_records": 0,
             "errors": []
         }
         
         async with LOFScraper() as scraper:
-            for code in lof_codes:
-                try:
-                    count = await scraper.sync_lof_data(code, days_back)
-                    if count > 0:
-                        results["successful_codes"] += 1
-                        results["total_records"] += count
-                    else:
-                        results["failed_codes"].append(code)
-                        
-                except Exception as e:
-                    self.logger.error(f"Failed to sync {code}: {e}")
-                    results["failed_codes"].append(code)
-                    results["errors"].append({"code": code, "error": str(e)})
+            result_counts = await self._sync_codes(scraper, lof_codes, days_back)
+        
+        self._aggregate_results(results, lof_codes, result_counts)
         
         # Update sync state
         self.last_sync["last_incremental_sync"] = start_time.isoformat()
+        self._last_inc_dt = start_time
         self.last_sync["success_count"] = results["successful_codes"]
         self.last_sync["total_records"] += results["total_records"]
         self.last_sync["failed_codes"] = results["failed_codes"]
@@ -111,28 +146,19 @@ class SyncManager:
             "start_time": start_time.isoformat(),
             "total_codes": len(lof_codes),
             "successful_codes": 0,
-            "failed_codes": [],
+            "failed_codes": set(),
             "total_records": 0,
             "errors": []
         }
         
         async with LOFScraper() as scraper:
-            for code in lof_codes:
-                try:
-                    count = await scraper.sync_lof_data(code, days_back)
-                    if count > 0:
-                        results["successful_codes"] += 1
-                        results["total_records"] += count
-                    else:
-                        results["failed_codes"].append(code)
-                        
-                except Exception as e:
-                    self.logger.error(f"Failed to sync {code}: {e}")
-                    results["failed_codes"].append(code)
-                    results["errors"].append({"code": code, "error": str(e)})
+            result_counts = await self._sync_codes(scraper, lof_codes, days_back)
+        
+        self._aggregate_results(results, lof_codes, result_counts)
         
         # Update sync state
         self.last_sync["last_full_sync"] = start_time.isoformat()
+        self._last_full_dt = start_time
         self.last_sync["success_count"] = results["successful_codes"]
         self.last_sync["total_records"] = results["total_records"]
         self.last_sync["failed_codes"] = results["failed_codes"]
@@ -159,17 +185,13 @@ class SyncManager:
     def _get_next_sync_time(self, sync_type: str) -> Any:
         """Calculate next sync time based on last sync"""
         if sync_type == "incremental":
-            last_sync_str = self.last_sync.get("last_incremental_sync")
-            if last_sync_str:
-                last_sync = datetime.fromisoformat(last_sync_str)
-                next_sync = last_sync + timedelta(hours=6)  # Every 6 hours
+            if self._last_inc_dt:
+                next_sync = self._last_inc_dt + timedelta(hours=6)  # Every 6 hours
                 return next_sync.isoformat()
         
         elif sync_type == "full":
-            last_sync_str = self.last_sync.get("last_full_sync")
-            if last_sync_str:
-                last_sync = datetime.fromisoformat(last_sync_str)
-                next_sync = last_sync + timedelta(days=7)  # Weekly
+            if self._last_full_dt:
+                next_sync = self._last_full_dt + timedelta(days=7)  # Weekly
                 return next_sync.isoformat()
         
         return None
@@ -179,17 +201,13 @@ class SyncManager:
         now = datetime.now()
         
         # Check if incremental sync is needed
-        last_incremental = self.last_sync.get("last_incremental_sync")
-        if last_incremental:
-            last_time = datetime.fromisoformat(last_incremental)
-            if (now - last_time).total_seconds() > 6 * 3600:  # 6 hours
+        if self._last_inc_dt:
+            if (now - self._last_inc_dt).total_seconds() > 6 * 3600:  # 6 hours
                 return "Incremental sync recommended - data may be stale"
         
         # Check if full sync is needed
-        last_full = self.last_sync.get("last_full_sync")
-        if last_full:
-            last_time = datetime.fromisoformat(last_full)
-            if (now - last_time).days > 7:  # 7 days
+        if self._last_full_dt:
+            if (now - self._last_full_dt).days > 7:  # 7 days
                 return "Full sync recommended - weekly refresh needed"
         
         return "Data appears up to date"
@@ -213,7 +231,7 @@ class SyncManager:
     
     async def retry_failed_codes(self) -> Dict[str, Any]:
         """Retry syncing failed codes"""
-        failed_codes = self.last_sync.get("failed_codes", [])
+        failed_codes = set(self.last_sync.get("failed_codes", ()))
         
         if not failed_codes:
             return {"message": "No failed codes to retry", "retried_codes": []}
@@ -224,24 +242,23 @@ class SyncManager:
             "retry_type": "failed_codes",
             "retried_codes": [],
             "successful_codes": 0,
-            "failed_codes": [],
+            "failed_codes": set(),
             "total_records": 0
         }
         
+        codes = list(failed_codes)
         async with LOFScraper() as scraper:
-            for code in failed_codes:
-                try:
-                    count = await scraper.sync_lof_data(code, days_back=7)
-                    if count > 0:
-                        results["successful_codes"] += 1
-                        results["total_records"] += count
-                        results["retried_codes"].append(code)
-                    else:
-                        results["failed_codes"].append(code)
-                        
-                except Exception as e:
-                    self.logger.error(f"Retry failed for {code}: {e}")
-                    results["failed_codes"].append(code)
+            result_counts = await self._sync_codes(scraper, codes, days_back=7)
+        
+        for code, count in zip(codes, result_counts):
+            if not isinstance(count, int):
+                self.logger.error(f"Retry failed for {code}: {count!r}")
+            elif count > 0:
+                results["retried_codes"].append(code)
+                results["total_records"] += count
+        
+        results["successful_codes"] = len(results["retried_codes"])
+        results["failed_codes"] = failed_codes - set(results["retried_codes"])
         
         # Update sync state
         self.last_sync["failed_codes"] = results["failed_codes"]
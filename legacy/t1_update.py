@@ -6,9 +6,48 @@ T+1 数据更新脚本
 import requests
 import pandas as pd
 import os
+import sys
 import json
 import time
+import logging
+import logging.handlers
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/javascript, */*; q=0.01',
+    'X-Requested-With': 'XMLHttpRequest',
+}
+
+# 复用 TCP/TLS 连接，避免每个代码都重新握手
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+def setup_logging(verbose: bool = False):
+    """逐代码进度写入日志文件，每100条批量落盘；--verbose 时同时输出到终端"""
+    file_handler = logging.FileHandler(Config.LOG_FILE, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(logging.handlers.MemoryHandler(
+        capacity=100,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    ))
+    
+    if verbose:
+        logger.addHandler(logging.StreamHandler(sys.stdout))
+    
+    logger.setLevel(getattr(logging, Config.LOG_LEVEL))
 
 def load_existing_data(code):
     """Load existing data for a code"""
@@ -19,19 +58,13 @@ def load_existing_data(code):
             df['price_dt'] = pd.to_datetime(df['price_dt'])
             return df
         except Exception as e:
-            print(f"Error loading {code}: {e}")
+            logger.error(f"Error loading {code}: {e}")
     return pd.DataFrame()
 
 def fetch_t1_data(code):
     """Fetch T+1 confirmed data (跳过T日未确认数据)"""
     url = f"https://www.jisilu.cn/data/lof/hist_list/{code}"
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json, text/javascript, */*; q=0.01',
-        'X-Requested-With': 'XMLHttpRequest',
-    }
-    
     params = {
         '___jsl': 'LST___t',
         'rp': '50',
@@ -39,43 +72,41 @@ def fetch_t1_data(code):
     }
     
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=30)
+        response = SESSION.get(url, params=params, timeout=30)
         
         if response.status_code == 200:
             data = response.json()
             rows = data.get('rows', [])
             
             if rows:
-                records = []
-                t_minus_records = []  # T-1日及以前的数据
+                # 按列收集，避免逐行构造 dict 再由 DataFrame 推断类型
+                columns = {key: [] for key in rows[0]['cell']}
                 
                 for row in rows:
                     cell = row['cell']
-                    record = dict(cell)
-                    record['code'] = code
                     
                     # 跳过T日未确认数据（discount_rt = "-"）
-                    if record.get('discount_rt') == "-":
+                    if cell.get('discount_rt') == "-":
                         continue
                     
-                    # 只保留有确定溢价率的数据
-                    try:
-                        discount_rt = float(record.get('discount_rt', 0))
-                        records.append(record)
-                    except (ValueError, TypeError):
-                        continue
+                    for key, values in columns.items():
+                        values.append(cell.get(key))
                 
-                if records:
-                    new_df = pd.DataFrame(records)
-                    new_df['price_dt'] = pd.to_datetime(new_df['price_dt'])
+                if columns['price_dt']:
+                    new_df = pd.DataFrame(columns)
+                    new_df['code'] = code
+                    new_df['price_dt'] = pd.to_datetime(new_df['price_dt'], format='%Y-%m-%d', cache=True)
                     new_df['discount_rt'] = pd.to_numeric(new_df['discount_rt'], errors='coerce')
                     
-                    return new_df
+                    # 只保留有确定溢价率的数据
+                    new_df = new_df.dropna(subset=['discount_rt'])
+                    if not new_df.empty:
+                        return new_df
         
         return pd.DataFrame()
         
     except Exception as e:
-        print(f"❌ Error fetching {code}: {e}")
+        logger.error(f"❌ Error fetching {code}: {e}")
         return pd.DataFrame()
 
 def update_t1_confirmed_data():
@@ -109,7 +140,7 @@ def update_t1_confirmed_data():
     skipped_codes = 0
     
     for i, code in enumerate(lof_codes, 1):
-        print(f"[{i:2d}/{len(lof_codes)}] 处理 {code}...")
+        logger.info(f"[{i:2d}/{len(lof_codes)}] 处理 {code}...")
         
         # 加载现有数据
         existing_df = load_existing_data(code)
@@ -118,7 +149,7 @@ def update_t1_confirmed_data():
         new_df = fetch_t1_data(code)
         
         if new_df.empty:
-            print(f"  ⚠️ 无可用T+1确认数据")
+            logger.info(f"  ⚠️ 无可用T+1确认数据")
             skipped_codes += 1
             continue
         
@@ -129,25 +160,27 @@ def update_t1_confirmed_data():
             new_df = new_df[~new_df['price_dt'].isin(existing_dates)]
             
             if not new_df.empty:
-                combined_df = pd.concat([existing_df, new_df])
-                combined_df = combined_df.sort_values('price_dt').reset_index(drop=True)
+                # 两段各自有序，稳定排序可按归并合并，近似线性
+                new_df = new_df.sort_values('price_dt', kind='mergesort')
+                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+                combined_df = combined_df.sort_values('price_dt', kind='mergesort', ignore_index=True)
                 
                 # 保存更新后的数据
                 combined_df.to_csv(f"data/lof_{code}.csv", index=False, encoding='utf-8-sig')
                 
                 latest_date = combined_df['price_dt'].max().strftime('%Y-%m-%d')
-                print(f"  ✅ 新增 {len(new_df)} 条T+1确认数据，最新日期: {latest_date}")
+                logger.info(f"  ✅ 新增 {len(new_df)} 条T+1确认数据，最新日期: {latest_date}")
                 total_new_records += len(new_df)
                 updated_codes += 1
             else:
-                print(f"  ℹ️ 无新T+1确认数据")
+                logger.info(f"  ℹ️ 无新T+1确认数据")
         else:
             # 新建文件
-            new_df = new_df.sort_values('price_dt').reset_index(drop=True)
+            new_df = new_df.sort_values('price_dt', kind='mergesort', ignore_index=True)
             new_df.to_csv(f"data/lof_{code}.csv", index=False, encoding='utf-8-sig')
             
             latest_date = new_df['price_dt'].max().strftime('%Y-%m-%d')
-            print(f"  🆕 创建文件，{len(new_df)} 条T+1确认数据，最新日期: {latest_date}")
+            logger.info(f"  🆕 创建文件，{len(new_df)} 条T+1确认数据，最新日期: {latest_date}")
             total_new_records += len(new_df)
             updated_codes += 1
         
@@ -180,4 +213,11 @@ def update_t1_confirmed_data():
             print(f"  {date}: {count} 个LOF")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="T+1 数据更新")
+    parser.add_argument("--verbose", action="store_true", help="在终端输出逐代码进度")
+    args = parser.parse_args()
+    
+    setup_logging(args.verbose)
     update_t1_confirmed_data()
\ No newline at end of file
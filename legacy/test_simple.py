@@ -1,17 +1,19 @@
 import streamlit as st
 import pandas as pd
 
+@st.cache_data
+def _demo_df():
+    """Simple test data, built once and reused across reruns"""
+    return pd.DataFrame({
+        'A': [1, 2, 3, 4],
+        'B': [10, 20, 30, 40]
+    })
+
 st.title("Simple Test Dashboard")
 st.write("Testing if Streamlit is working...")
 
-# Simple test data
-df = pd.DataFrame({
-    'A': [1, 2, 3, 4],
-    'B': [10, 20, 30, 40]
-})
-
 st.write("DataFrame:")
-st.dataframe(df)
+st.dataframe(_demo_df())
 
 st.write("Metrics:")
 col1, col2, col3 = st.columns(3)
@@ -3,16 +3,22 @@
 交易决策框架
 基于历史溢价率数据提供交易信号和风险管理
 """
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lof_io import load_all_codes
+
+IQR_FENCE_K = 1.5   # 箱线图异常值边界系数
+
 @dataclass
 class TradingSignal:
     """交易信号数据类"""
@@ -38,7 +44,7 @@ class TradingFramework:
     
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        self.lof_data = {}
+        self.cols = {}   # 代码 -> 按日期排序的列数组（SoA）
         self.trading_config = self._load_config()
         self.load_all_data()
     
@@ -59,33 +65,39 @@ class TradingFramework:
         }
     
     def load_all_data(self):
-        """加载所有LOF数据"""
-        csv_files = [f for f in os.listdir(self.data_dir) 
-                    if f.startswith('lof_') and f.endswith('.csv')]
-        
-        for file in csv_files:
-            code = file.replace('lof_', '').replace('.csv', '')
-            file_path = os.path.join(self.data_dir, file)
-            try:
-                df = pd.read_csv(file_path)
-                df['price_dt'] = pd.to_datetime(df['price_dt'])
-                df['discount_rt'] = pd.to_numeric(df['discount_rt'], errors='coerce')
-                df['price'] = pd.to_numeric(df['price'], errors='coerce')
-                df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-                self.lof_data[code] = df.sort_values('price_dt')
-            except Exception as e:
-                print(f"加载 {code} 数据失败: {e}")
+        """加载所有LOF数据（与仪表板共用 utils.lof_io 的解析结果）"""
+        self.cols = load_all_codes(self.data_dir)
+    
+    def _window_start(self, code: str, days: int) -> int:
+        """最近 days 天窗口在已排序数组中的起始下标"""
+        cutoff = np.datetime64(datetime.now() - timedelta(days=days), 'ns').astype(np.int64)
+        return int(np.searchsorted(self.cols[code]['dt'], cutoff, side='left'))
+    
+    def _window_stats(self, code: str) -> Tuple[Dict, Dict, Dict, Dict]:
+        """7/14/21 日统计及21日分布：一次 searchsorted 取出三个起点，短窗口是21日窗口的子视图"""
+        now = datetime.now()
+        cutoffs = np.array(
+            [np.datetime64(now - timedelta(days=days), 'ns') for days in (21, 14, 7)]
+        ).astype(np.int64)
+        start_21, start_14, start_7 = np.searchsorted(self.cols[code]['dt'], cutoffs, side='left')
+        premiums_21 = self.cols[code]['discount_rt'][start_21:]
+        return (
+            self._premium_stats(premiums_21[start_7 - start_21:]),
+            self._premium_stats(premiums_21[start_14 - start_21:]),
+            self._premium_stats(premiums_21),
+            self._premium_distribution(premiums_21)
+        )
     
     def calculate_market_context(self, code: str) -> MarketContext:
         """计算市场环境"""
-        if code not in self.lof_data:
+        if code not in self.cols:
             return MarketContext("NEUTRAL", "MEDIUM", "STABLE")
         
-        df = self.lof_data[code]
-        recent_7d = df.tail(7)
+        premiums_7d = self.cols[code]['discount_rt'][-7:]
+        amount_7d = self.cols[code]['amount'][-7:]
         
         # 市场趋势
-        premium_trend = recent_7d['discount_rt'].iloc[-1] - recent_7d['discount_rt'].iloc[0]
+        premium_trend = premiums_7d[-1] - premiums_7d[0]
         if premium_trend > 0.5:
             sentiment = "BULL"
         elif premium_trend < -0.5:
@@ -94,7 +106,7 @@ class TradingFramework:
             sentiment = "NEUTRAL"
         
         # 波动率
-        volatility = recent_7d['discount_rt'].std()
+        volatility = np.nanstd(premiums_7d, ddof=1)
         if volatility > 1.5:
             vol_level = "HIGH"
         elif volatility < 0.5:
@@ -103,7 +115,7 @@ class TradingFramework:
             vol_level = "MEDIUM"
         
         # 成交量趋势
-        volume_trend = recent_7d['amount'].iloc[-1] / recent_7d['amount'].iloc[0] - 1
+        volume_trend = amount_7d[-1] / amount_7d[0] - 1
         if volume_trend > 0.2:
             volume_trend = "INCREASING"
         elif volume_trend < -0.2:
@@ -115,53 +127,59 @@ class TradingFramework:
     
     def analyze_premium_distribution(self, code: str, days: int) -> Dict:
         """分析溢价率分布"""
-        if code not in self.lof_data:
+        if code not in self.cols:
             return {}
         
-        df = self.lof_data[code]
-        cutoff_date = datetime.now() - timedelta(days=days)
-        data = df[df['price_dt'] >= cutoff_date].copy()
-        
-        if data.empty:
+        return self._premium_distribution(self.cols[code]['discount_rt'][self._window_start(code, days):])
+    
+    @staticmethod
+    def _premium_distribution(premiums: np.ndarray) -> Dict:
+        """窗口内溢价率的分位数与异常值边界"""
+        if premiums.size == 0:
             return {}
         
-        premiums = data['discount_rt'].dropna()
+        premiums = premiums[~np.isnan(premiums)]
+        
+        # 只对所需位置做部分划分（O(N)），再线性插值，结果与 np.percentile 一致
+        ranks = np.array([0.05, 0.25, 0.5, 0.75, 0.95]) * (premiums.size - 1)
+        lo = np.floor(ranks).astype(np.intp)
+        hi = np.ceil(ranks).astype(np.intp)
+        part = np.partition(premiums, np.unique(np.concatenate([lo, hi])))
+        p5, p25, p50, p75, p95 = (float(p) for p in part[lo] + (part[hi] - part[lo]) * (ranks - lo))
+        iqr = p75 - p25
+        lower_fence = p25 - IQR_FENCE_K * iqr
+        upper_fence = p75 + IQR_FENCE_K * iqr
         
         return {
             'percentiles': {
-                '5%': float(np.percentile(premiums, 5)),
-                '25%': float(np.percentile(premiums, 25)),
-                '50%': float(np.percentile(premiums, 50)),
-                '75%': float(np.percentile(premiums, 75)),
-                '95%': float(np.percentile(premiums, 95))
+                '5%': p5,
+                '25%': p25,
+                '50%': p50,
+                '75%': p75,
+                '95%': p95
             },
             'quartiles': {
-                'Q1': float(np.percentile(premiums, 25)),
-                'Q2': float(np.percentile(premiums, 50)),
-                'Q3': float(np.percentile(premiums, 75))
+                'Q1': p25,
+                'Q2': p50,
+                'Q3': p75
             },
             'outliers': {
-                'lower_fence': float(np.percentile(premiums, 25) - 1.5 * (np.percentile(premiums, 75) - np.percentile(premiums, 25))),
-                'upper_fence': float(np.percentile(premiums, 75) + 1.5 * (np.percentile(premiums, 75) - np.percentile(premiums, 25)))
+                'lower_fence': lower_fence,
+                'upper_fence': upper_fence
             }
         }
     
     def generate_trading_signal(self, code: str) -> Optional[TradingSignal]:
         """生成交易信号"""
-        if code not in self.lof_data:
+        if code not in self.cols:
             return None
         
-        df = self.lof_data[code]
-        
         # 获取最新数据
-        latest = df.iloc[-1]
-        current_premium = latest['discount_rt']
-        current_price = latest['price']
+        current_premium = float(self.cols[code]['discount_rt'][-1])
+        current_price = float(self.cols[code]['price'][-1])
         
-        # 计算各期统计
-        stats_7d = self.calculate_premium_stats(code, 7)
-        stats_14d = self.calculate_premium_stats(code, 14)
-        stats_21d = self.calculate_premium_stats(code, 21)
+        # 计算各期统计及溢价率分布
+        stats_7d, stats_14d, stats_21d, distribution = self._window_stats(code)
         
         if not all([stats_7d, stats_14d, stats_21d]):
             return None
@@ -169,9 +187,6 @@ class TradingFramework:
         # 市场环境
         market_context = self.calculate_market_context(code)
         
-        # 溢价率分布分析
-        distribution = self.analyze_premium_distribution(code, 21)
-        
         # 信号生成逻辑
         signal, confidence, reasons = self._generate_signal_logic(
             current_premium, stats_7d, stats_14d, stats_21d, distribution, market_context
@@ -271,27 +286,28 @@ class TradingFramework:
     
     def calculate_premium_stats(self, code: str, days: int) -> Dict:
         """计算溢价率统计"""
-        if code not in self.lof_data:
+        if code not in self.cols:
             return {}
         
-        df = self.lof_data[code]
-        cutoff_date = datetime.now() - timedelta(days=days)
-        recent_data = df[df['price_dt'] >= cutoff_date].copy()
-        
-        if recent_data.empty:
+        return self._premium_stats(self.cols[code]['discount_rt'][self._window_start(code, days):])
+    
+    @staticmethod
+    def _premium_stats(premiums: np.ndarray) -> Dict:
+        """窗口内溢价率的均值、标准差、当前值与条数"""
+        if premiums.size == 0:
             return {}
         
         return {
-            'mean': float(recent_data['discount_rt'].mean()),
-            'std': float(recent_data['discount_rt'].std()),
-            'current': float(recent_data['discount_rt'].iloc[-1]) if not recent_data.empty else 0,
-            'count': len(recent_data)
+            'mean': float(np.nanmean(premiums)),
+            'std': float(np.nanstd(premiums, ddof=1)),
+            'current': float(premiums[-1]),
+            'count': len(premiums)
         }
     
     def get_all_signals(self) -> List[TradingSignal]:
         """获取所有交易信号"""
         signals = []
-        for code in self.lof_data.keys():
+        for code in self.cols:
             signal = self.generate_trading_signal(code)
             if signal and signal.confidence > self.trading_config['thresholds']['confidence_threshold']:
                 signals.append(signal)
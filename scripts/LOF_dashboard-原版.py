@@ -18,11 +18,21 @@ warnings.filterwarnings("ignore")
 # 工具函数
 # ======================================================
 
+# 仪表板只用到这些列；"-" 视为缺失，省去 to_numeric 二次转换
+LOF_USECOLS = ['fund_id', 'price_dt', 'price', 'net_value', 'est_val',
+               'discount_rt', 'volume', 'amount', 'amount_incr']
+LOF_DTYPES = {col: 'float64' for col in LOF_USECOLS[2:]}
+
 def is_monotonic_increasing(arr):
-    return all(arr[i] < arr[i + 1] for i in range(len(arr) - 1))
+    return bool(np.all(np.diff(np.asarray(arr)) > 0))
 
 def is_monotonic_decreasing(arr):
-    return all(arr[i] > arr[i + 1] for i in range(len(arr) - 1))
+    return bool(np.all(np.diff(np.asarray(arr)) < 0))
+
+DAY_NS = 86_400_000_000_000
+
+def now_ns():
+    return np.datetime64(datetime.now(), "ns").astype(np.int64)
 
 def is_pre_order_time():
     now = datetime.now().time()
@@ -44,11 +54,18 @@ def score_to_signal(score):
 # 分析器
 # ======================================================
 
+@st.cache_resource(ttl=300, show_spinner=False)
+def get_analyzer(data_dir="data"):
+    """每个进程只构建一次分析器，5分钟后随数据刷新重建"""
+    return LOFArbitrageAnalyzer(data_dir)
+
 class LOFArbitrageAnalyzer:
 
     def __init__(self, data_dir="data"):
         self.data_dir = data_dir
         self.lof_data = {}
+        self.dt_ns = {}     # 代码 -> price_dt (int64 纳秒)，用于按日期二分定位窗口
+        self.disc_rt = {}   # 代码 -> discount_rt (float64)
         self.load_all_data()
 
     def load_all_data(self):
@@ -60,36 +77,61 @@ class LOFArbitrageAnalyzer:
             code = file.replace('lof_', '').replace('.csv', '')
             file_path = os.path.join(self.data_dir, file)
             try:
-                df = pd.read_csv(file_path)
-                df['price_dt'] = pd.to_datetime(df['price_dt'])
-                df['discount_rt'] = pd.to_numeric(df['discount_rt'], errors='coerce')
+                df = pd.read_csv(
+                    file_path,
+                    usecols=LOF_USECOLS,
+                    dtype=LOF_DTYPES,
+                    na_values=['-'],
+                    parse_dates=['price_dt'],
+                    engine='c'
+                )
                 df["price_pct"] = df["price"].pct_change() * 100
                 if pd.isna(df['discount_rt'].iloc[-1]):
                     df['discount_rt'].iloc[-1] = round((df['price'].iloc[-1]/df['est_val'].iloc[-1]-1)*100,2)
-                self.lof_data[code] = df.sort_values('price_dt')
+                if not df['price_dt'].is_monotonic_increasing:
+                    df = df.sort_values('price_dt')
+                # 图表均线在加载时一次算好
+                for w in (7, 14, 21):
+                    df[f'ma{w}'] = df['discount_rt'].rolling(w).mean()
+                self.lof_data[code] = df
+                self.dt_ns[code] = df['price_dt'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+                self.disc_rt[code] = df['discount_rt'].to_numpy(dtype=np.float64)
             except Exception as e:
                 print(f"加载 {code} 数据失败: {e}")
 
-    def premium_stats(self, df, days):
-        cutoff = datetime.now() - timedelta(days=days)
-        d = df[df["price_dt"] >= cutoff]
-        return {
-            "mean": d["discount_rt"].mean(),
-            "std": d["discount_rt"].std()
-        }
-
-    def score_one_lof(self, code):
-        df = self.lof_data[code].copy()
-        recent = df.tail(30)
-
-        current = recent.iloc[-1]
-        cur_premium = current["discount_rt"]
-        cur_volume = current["volume"]
-        cur_pct = current["price_pct"]
-
-        stats7 = self.premium_stats(df, 7)
-        stats14 = self.premium_stats(df, 14)
-        stats21 = self.premium_stats(df, 21)
+    def premium_stats(self, code, days, today_ns):
+        """多个自然日窗口一次定位：一次 searchsorted 求出各窗口起点，都在最长窗口的同一段切片上计算"""
+        starts = np.searchsorted(self.dt_ns[code], today_ns - np.asarray(days) * DAY_NS)
+        first = starts.min()
+        tail = self.disc_rt[code][first:]
+        stats = []
+        for start in starts:
+            d = tail[start - first:]
+            stats.append({
+                "mean": np.nanmean(d),
+                "std": np.nanstd(d, ddof=1)
+            })
+        return stats
+
+    def score_one_lof(self, code, today_ns=None, pre_order=None):
+        if today_ns is None:
+            today_ns = now_ns()
+        if pre_order is None:
+            pre_order = is_pre_order_time()
+        df = self.lof_data[code]
+        # 一次取出底层数组，之后只做下标访问
+        disc = self.disc_rt[code]
+        volume = df["volume"].to_numpy()
+        amount = df["amount"].to_numpy()
+        amount_incr = df["amount_incr"].to_numpy()
+        price_pct = df["price_pct"].to_numpy()
+
+        cur_premium = disc[-1]
+        cur_volume = volume[-1]
+        cur_pct = price_pct[-1]
+        last3 = disc[-3:]
+
+        stats7, stats14, stats21 = self.premium_stats(code, (7, 14, 21), today_ns)
 
         # ================= 溢价率维度 =================
         premium_score = 0
@@ -119,19 +161,20 @@ class LOFArbitrageAnalyzer:
                 premium_score += 20
                 plus.append("当前溢价率≥20%，属极端溢价空间")
 
-            last3 = recent["discount_rt"].tail(3).values
+            # 一次取最小值代替逐元素比较；含 NaN 时 min 为 NaN，比较结果同样为 False
+            last3_min = last3.min()
 
-            if (last3 >= 5).all() and is_monotonic_increasing(last3):
+            if last3_min >= 5 and is_monotonic_increasing(last3):
                 premium_score += 15
                 plus.append(
                     "近3日溢价率均≥5%且逐日上升，套利空间稳步扩张"
                 )
-            elif (last3 >= 5).all():
+            elif last3_min >= 5:
                 premium_score += 10
                 plus.append(
                     "近3日溢价率均≥5%，套利空间稳定存在"
                 )
-            elif (last3 >= 3).all():
+            elif last3_min >= 3:
                 premium_score += 5
                 plus.append(
                     "近3日溢价率维持在3%–5%，具备溢价套利基础"
@@ -142,7 +185,7 @@ class LOFArbitrageAnalyzer:
                 minus.append(
                     "溢价率近3日逐日下降，短期套利窗口收敛"
                 )
-            elif recent["discount_rt"].iloc[-1] < recent["discount_rt"].iloc[-2]:
+            elif disc[-1] < disc[-2]:
                 premium_score -= 5
                 minus.append(
                     "溢价率较昨日有所下滑，但尚未连续回落，短期套利动能减弱"
@@ -172,21 +215,21 @@ class LOFArbitrageAnalyzer:
         liquidity_score = 0
 
         # ---------- 基础流动性门槛 ----------
-        if is_pre_order_time():
-            liquidity_window = recent.iloc[-4:-1]   # 不含今日
+        if pre_order:
+            window = slice(-4, -1)   # 不含今日
         else:
-            liquidity_window = recent.iloc[-3:]     # 含今日
+            window = slice(-3, None) # 含今日
 
-        if len(liquidity_window) == 3 and \
-        (liquidity_window["volume"] >= 1000).all() and \
-        (liquidity_window["amount"] >= 1000).all():
+        if len(volume[window]) == 3 and \
+        (volume[window] >= 1000).all() and \
+        (amount[window] >= 1000).all():
 
             liquidity_score += 60
             plus.append("近3日成交额均≥1000万元，场内份额均≥1000万份，具备套利执行基础")
 
             # ---------- 加分条件：份额稳定性 ----------
-            amount_incr_today = current["amount_incr"]
-            last3_amount_incr = recent["amount_incr"].tail(3).values
+            amount_incr_today = amount_incr[-1]
+            last3_amount_incr = amount_incr[-3:]
 
             if abs(amount_incr_today) < 1:
                 liquidity_score += 5
@@ -194,16 +237,15 @@ class LOFArbitrageAnalyzer:
                     "当日场内份额增速绝对值<1%，套利盘未明显集中进出"
                 )
 
-            if (np.abs(last3_amount_incr) < 1).all():
+            # 绝对值均 <1 等价于区间 (-1, 1) 同时卡住最小值和最大值
+            if -1 < last3_amount_incr.min() and last3_amount_incr.max() < 1:
                 liquidity_score += 15
                 plus.append(
                     "近3日份额增速绝对值均<1%，份额结构高度稳定"
                 )
 
             # ---------- 扣分条件：套利机会快速消失 ----------
-            last3_premium = recent["discount_rt"].tail(3).values
-
-            if amount_incr_today > 3 and is_monotonic_decreasing(last3_premium):
+            if amount_incr_today > 3 and is_monotonic_decreasing(last3):
                 liquidity_score -= 20
                 minus.append(
                     "当日场内份额增速>3% 且溢价率连续回落，套利盘加速撤离"
@@ -226,8 +268,8 @@ class LOFArbitrageAnalyzer:
             "current_volume": cur_volume,
             "price_pct": cur_pct,
             "key_metrics": {
-                "premium_3d": recent["discount_rt"].tail(3).mean(),
-                "premium_7d": recent["discount_rt"].tail(7).mean()
+                "premium_3d": np.nanmean(last3),
+                "premium_7d": np.nanmean(disc[-7:])
             },
             "reasons": {
                 "plus": plus,
@@ -236,9 +278,12 @@ class LOFArbitrageAnalyzer:
         }
 
     def get_all_signals(self):
+        # 当前时间与申购时段判断对所有基金相同，只取一次
+        today_ns = now_ns()
+        pre_order = is_pre_order_time()
         signals = []
         for code in self.lof_data:
-            signals.append(self.score_one_lof(code))
+            signals.append(self.score_one_lof(code, today_ns, pre_order))
         return sorted(signals, key=lambda x: x["score"], reverse=True)
 
 def signal_font_color(val):
@@ -271,7 +316,7 @@ def main():
     st.title("📈 LOF溢价套利-每日机会")
     st.markdown("### 基于历史数据的溢价套利信号")
 
-    analyzer = LOFArbitrageAnalyzer()
+    analyzer = get_analyzer()
     all_signals = analyzer.get_all_signals()
 
     # ========= 新：默认展示逻辑 =========
@@ -388,11 +433,11 @@ def main():
         if chart_type == "溢价率":
             fig.add_trace(go.Scatter(x=df["price_dt"], y=df["discount_rt"], name="溢价率"))
             if show_7d:
-                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["discount_rt"].rolling(7).mean(), name="7日均线"))
+                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["ma7"], name="7日均线"))
             if show_14d:
-                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["discount_rt"].rolling(14).mean(), name="14日均线"))
+                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["ma14"], name="14日均线"))
             if show_21d:
-                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["discount_rt"].rolling(21).mean(), name="21日均线"))
+                fig.add_trace(go.Scatter(x=df["price_dt"], y=df["ma21"], name="21日均线"))
 
         elif chart_type == "价格":
             fig.add_trace(go.Scatter(x=df["price_dt"], y=df["price"], name="价格"))
@@ -405,13 +450,15 @@ def main():
         st.plotly_chart(fig, use_container_width=True)
 
         with st.expander("📊 详细数据", expanded=True):
-            display_df = df[['fund_id','price_dt','price','net_value','est_val','discount_rt','volume','amount','amount_incr']].copy()
+            # 涨跌幅直接取加载时算好的 price_pct，只格式化展示的10行
+            display_df = df[['fund_id','price_dt','price','net_value','est_val','discount_rt','price_pct','volume','amount','amount_incr']].tail(10).copy()
             display_df["price_dt"] = display_df["price_dt"].dt.strftime("%Y-%m-%d")
-            display_df['price_pct'] = (display_df["price"].pct_change()*100).apply(lambda x: format(x,'.2f'))
-            display_df = display_df[['fund_id','price_dt','price','net_value','est_val','discount_rt','price_pct','volume','amount','amount_incr']]
             display_df.columns = ['代码', '交易日期', '现价', '基金净值', '实时估值', '溢价率(%)', '涨跌幅(%)','成交(万元)','场内份额(万份)','场内新增(万份)']
 
-            st.dataframe(display_df.tail(10), use_container_width=True)
+            st.dataframe(
+                display_df.style.format({'涨跌幅(%)': '{:.2f}', '溢价率(%)': '{:.2f}'}),
+                use_container_width=True
+            )
 
     # ================= 套利操作 =================
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -1,9 +1,17 @@
 """
 LOF 溢价套利胜率评分仪表板（完整版）
 """
+import csv
+import html
 import os
+import pickle
+import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time
+from enum import IntFlag, auto
+from functools import lru_cache
+from operator import itemgetter
 from zoneinfo import ZoneInfo
 import numpy as np
 import pandas as pd
@@ -11,10 +19,16 @@ import streamlit as st
 import plotly.graph_objects as go
 from streamlit_autorefresh import st_autorefresh
 
+# 添加路径以便导入模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lof_io import MARKER_TAIL, data_version, iter_lof_files, read_lof_csv_incremental, to_soa
+
 warnings.filterwarnings("ignore")
 
 APP_VERSION = "2026-01-18 07:01 UTC"
 
+@lru_cache(maxsize=1)
 def get_project_root() -> str:
     """当前脚本所在目录的父目录"""
     current_file = os.path.abspath(__file__)
@@ -30,11 +44,28 @@ def get_cache_path(project_root: str) -> str:
 # 工具函数
 # ======================================================
 
-def is_monotonic_increasing(arr):
-    return all(arr[i] < arr[i + 1] for i in range(len(arr) - 1))
+# 均线：(窗口, 颜色)，与"均线设置"中的三个勾选框一一对应
+MA_STYLES = ((5, 'red'), (10, 'green'), (15, 'orange'))
+
+# 需要预先计算均线的列；nv 为净值缺失时以估值补齐的序列
+MA_COLUMNS = ('discount_rt', 'price', 'nv')
+
+# 单序列图表：模式 -> (数据列, 名称, 颜色, 标题, y轴标题)
+CHART_SPECS = {
+    "溢价率": ("discount_rt", "溢价率", "blue", "溢价趋势", "溢价率(%)"),
+    "价格": ("price", "价格", "#E3B341", "价格趋势", "价格(元)"),
+    "净值": ("nv", "净值", "#8b5a2b", "净值趋势", "净值(元)"),
+}
+
+# 趋势图最近 LABEL_TAIL 根溢价率柱子标数值（画标记的点数 MARKER_TAIL 与其他仪表板共用）
+LABEL_TAIL = 30
 
-def is_monotonic_decreasing(arr):
-    return all(arr[i] > arr[i + 1] for i in range(len(arr) - 1))
+# 信号结果用到的列
+SIGNAL_COLUMNS = itemgetter("discount_rt", "volume", "price_pct")
+
+# 仪表板只用到这些列
+LOF_USECOLS = ['fund_id', 'price_dt', 'price', 'net_value', 'est_val',
+               'discount_rt', 'volume', 'amount', 'amount_incr']
 
 def now_cn():
     return datetime.now(ZoneInfo("Asia/Shanghai"))
@@ -55,6 +86,313 @@ def score_to_signal(score):
     else:
         return "放弃"
 
+# ======================================================
+# 评分内核
+# ======================================================
+
+class Reason(IntFlag):
+    """评分原因位标志，定义顺序即展示顺序"""
+    # 加分项
+    ABOVE_5D_MEAN = auto()
+    ABOVE_10D_MEAN = auto()
+    ABOVE_15D_MEAN = auto()
+    PREMIUM_10_20 = auto()
+    PREMIUM_ABOVE_20 = auto()
+    RISING_ABOVE_5_3D = auto()
+    ABOVE_5_3D = auto()
+    ABOVE_3_3D = auto()
+    LIQUIDITY_OK = auto()
+    SHARES_STABLE_TODAY = auto()
+    SHARES_STABLE_3D = auto()
+    # 扣分项
+    DISCOUNT = auto()
+    FALLING_3D = auto()
+    BELOW_YESTERDAY = auto()
+    NEAR_LIMIT_DOWN = auto()
+    DROP_8PCT = auto()
+    DROP_5PCT = auto()
+    PREMIUM_MISSING = auto()
+    LOW_LIQUIDITY = auto()
+    ARBITRAGE_EXIT = auto()
+
+REASON_TEXT = {
+    Reason.ABOVE_5D_MEAN: "当前溢价率显著高于5日均值",
+    Reason.ABOVE_10D_MEAN: "当前溢价率显著高于10日均值",
+    Reason.ABOVE_15D_MEAN: "当前溢价率显著高于15日均值",
+    Reason.PREMIUM_10_20: "当前溢价率处于10–20%，套利空间充足",
+    Reason.PREMIUM_ABOVE_20: "当前溢价率 ≥20%，属于极端溢价空间",
+    Reason.RISING_ABOVE_5_3D: "近3日溢价率均 ≥5%且逐日上升，套利空间稳步扩张",
+    Reason.ABOVE_5_3D: "近3日溢价率均 ≥5%，套利空间稳定存在",
+    Reason.ABOVE_3_3D: "近3日溢价率维持在3%–5%，具备溢价套利基础",
+    Reason.LIQUIDITY_OK: "近3日成交额均 ≥1000万元，场内份额均 ≥1000万份，具备套利执行基础",
+    Reason.SHARES_STABLE_TODAY: "当日场内份额增速绝对值 <1%，套利盘未明显集中进出",
+    Reason.SHARES_STABLE_3D: "近3日份额增速绝对值均 <1%，份额结构高度稳定",
+    Reason.DISCOUNT: "当前为折价，不适用溢价套利策略",
+    Reason.FALLING_3D: "溢价率近3日逐日下降，短期套利窗口收敛",
+    Reason.BELOW_YESTERDAY: "溢价率较昨日有所下滑，但尚未连续回落，短期套利动能减弱",
+    Reason.NEAR_LIMIT_DOWN: "场内价格接近跌停，情绪化抛压显著，套利风险极高",
+    Reason.DROP_8PCT: "场内价格跌超8%，恐慌性下跌阶段，溢价稳定性存疑",
+    Reason.DROP_5PCT: "场内价格跌超5%，短期情绪偏弱，需防止溢价快速回落",
+    Reason.PREMIUM_MISSING: "当日溢价率缺失，无法进一步分析",
+    Reason.LOW_LIQUIDITY: "近3日成交额或场内份额不足，存在较大的流动性风险，套利需谨慎",
+    Reason.ARBITRAGE_EXIT: "当日场内份额增速 >3% 且溢价率连续回落，套利盘加速撤离",
+}
+
+PLUS_REASONS = (
+    Reason.ABOVE_5D_MEAN | Reason.ABOVE_10D_MEAN | Reason.ABOVE_15D_MEAN
+    | Reason.PREMIUM_10_20 | Reason.PREMIUM_ABOVE_20
+    | Reason.RISING_ABOVE_5_3D | Reason.ABOVE_5_3D | Reason.ABOVE_3_3D
+    | Reason.LIQUIDITY_OK | Reason.SHARES_STABLE_TODAY | Reason.SHARES_STABLE_3D
+)
+MINUS_REASONS = ~PLUS_REASONS
+
+def reasons_to_text(bits):
+    """仅在展示时把位标志还原为文字"""
+    bits = Reason(bits)
+    return [REASON_TEXT[r] for r in Reason if r in bits]
+
+def batch_premium_stats(lof_cols, codes, windows=(5, 10, 15)):
+    """各代码最近溢价率右对齐成矩阵，按行一次算出各窗口的 (均值, 标准差)"""
+    disc_mat = _tail_matrix(lof_cols, codes, "discount_rt", max(windows))
+
+    stats = []
+    for w in windows:
+        window = disc_mat[:, -w:]
+        stats.append(np.nanmean(window, axis=1))
+        stats.append(np.nanstd(window, axis=1, ddof=1))
+    return np.column_stack(stats)
+
+def _mean_std(arr, days):
+    """最近 days 日的 (均值, 标准差)，与 pandas 一样跳过缺失值"""
+    tail = arr[-days:]
+    return np.nanmean(tail), np.nanstd(tail, ddof=1)
+
+def _score_kernel(discount_rt, volume, amount, amount_incr, price_pct, pre_order, stats=None):
+    """只接收扁平数组的评分内核，返回 (总分, 加分位掩码, 扣分位掩码)
+    stats 为 batch_premium_stats 的一行 (5/10/15日均值与标准差)，缺省时现算"""
+    plus_bits = Reason(0)
+    minus_bits = Reason(0)
+
+    # ================= 溢价率维度 =================
+    premium_score = 0
+    # 分支判断用 Python float，避免每次比较都走 numpy 标量运算
+    cur_premium = float(discount_rt[-1])
+    cur_pct = float(price_pct[-1])
+    last3 = discount_rt[-3:]
+    # 近3日逐日涨跌方向只算一次，供溢价与流动性两处判断复用
+    last3_diff = np.diff(last3)
+    rising_3d = bool((last3_diff > 0).all())
+    falling_3d = bool((last3_diff < 0).all())
+
+    if cur_premium < 0:
+        minus_bits |= Reason.DISCOUNT
+    elif cur_premium == cur_premium:
+        premium_score += 60 if cur_premium >= 5 else int(cur_premium * 10)
+
+        if stats is None:
+            # 5/10/15日窗口都取自同一段最近15日切片
+            tail15 = discount_rt[-15:]
+            stats = [v for w in (5, 10, 15) for v in _mean_std(tail15, w)]
+        mean5, std5, mean10, std10, mean15, std15 = (float(v) for v in stats)
+
+        if cur_premium > mean5 + std5:
+            premium_score += 5
+            plus_bits |= Reason.ABOVE_5D_MEAN
+
+        if cur_premium - mean10 > std10 * 1.5:
+            premium_score += 5
+            plus_bits |= Reason.ABOVE_10D_MEAN
+
+        if cur_premium - mean15 > std15 * 2:
+            premium_score += 5
+            plus_bits |= Reason.ABOVE_15D_MEAN
+
+        if 10 <= cur_premium < 20:
+            premium_score += 10
+            plus_bits |= Reason.PREMIUM_10_20
+        elif cur_premium >= 20:
+            premium_score += 20
+            plus_bits |= Reason.PREMIUM_ABOVE_20
+
+        # 一次取最小值代替逐元素比较；含 NaN 时 min 为 NaN，比较结果同样为 False
+        last3_min = last3.min()
+
+        if last3_min >= 5 and rising_3d:
+            premium_score += 15
+            plus_bits |= Reason.RISING_ABOVE_5_3D
+        elif last3_min >= 5:
+            premium_score += 10
+            plus_bits |= Reason.ABOVE_5_3D
+        elif last3_min >= 3:
+            premium_score += 5
+            plus_bits |= Reason.ABOVE_3_3D
+
+        if falling_3d:
+            premium_score -= 10
+            minus_bits |= Reason.FALLING_3D
+        elif cur_premium < float(discount_rt[-2]):
+            premium_score -= 5
+            minus_bits |= Reason.BELOW_YESTERDAY
+
+        if cur_pct <= -9.5:
+            premium_score -= 20
+            minus_bits |= Reason.NEAR_LIMIT_DOWN
+        elif cur_pct <= -8:
+            premium_score -= 15
+            minus_bits |= Reason.DROP_8PCT
+        elif cur_pct <= -5:
+            premium_score -= 10
+            minus_bits |= Reason.DROP_5PCT
+    else:
+        minus_bits |= Reason.PREMIUM_MISSING
+
+    premium_score = max(0, 0.6*min(100, premium_score))
+
+    # ================= 流动性维度 =================
+    liquidity_score = 0
+
+    # ---------- 基础流动性门槛 ----------
+    if pre_order:
+        window = slice(-4, -1)   # 不含今日
+    else:
+        window = slice(-3, None) # 含今日
+    window_volume = volume[window]
+    window_amount = amount[window]
+
+    if len(window_volume) == 3 and \
+    (window_volume >= 1000).all() and \
+    (window_amount >= 1000).all():
+
+        liquidity_score += 60
+        plus_bits |= Reason.LIQUIDITY_OK
+
+        # ---------- 加分条件：份额稳定性 ----------
+        amount_incr_today = float(amount_incr[-1])
+
+        if abs(amount_incr_today) < 1:
+            liquidity_score += 5
+            plus_bits |= Reason.SHARES_STABLE_TODAY
+
+        # 绝对值均 <1 等价于区间 (-1, 1) 同时卡住最小值和最大值
+        if -1 < amount_incr[-3:].min() and amount_incr[-3:].max() < 1:
+            liquidity_score += 15
+            plus_bits |= Reason.SHARES_STABLE_3D
+
+        # ---------- 扣分条件：套利机会快速消失 ----------
+        if amount_incr_today > 3 and falling_3d:
+            liquidity_score -= 20
+            minus_bits |= Reason.ARBITRAGE_EXIT
+
+    else:
+        minus_bits |= Reason.LOW_LIQUIDITY
+
+    liquidity_score = max(0, 0.5*min(80, liquidity_score))
+
+    return int(premium_score + liquidity_score), plus_bits, minus_bits
+
+def _tail_matrix(lof_cols, codes, col, width):
+    """各代码最近 width 日的某列右对齐成 (代码数, width) 矩阵，不足处补 NaN"""
+    mat = np.full((len(codes), width), np.nan)
+    for i, code in enumerate(codes):
+        tail = lof_cols[code][col][-width:]
+        mat[i, width - len(tail):] = tail
+    return mat
+
+def _flags(*pairs):
+    """(布尔向量, 原因) 合成每行的位掩码"""
+    bits = np.zeros(len(pairs[0][0]), dtype=np.int64)
+    for mask, reason in pairs:
+        bits |= np.where(mask, int(reason), 0)
+    return bits
+
+def score_batch(lof_cols, codes, pre_order, stats):
+    """与 _score_kernel 规则一致的整批评分，按掩码一次算完全部代码
+    历史不足4日的代码窗口长度不定，仍交给 _score_kernel 逐个处理"""
+    disc = _tail_matrix(lof_cols, codes, "discount_rt", 4)
+    volume = _tail_matrix(lof_cols, codes, "volume", 4)
+    amount = _tail_matrix(lof_cols, codes, "amount", 4)
+    amount_incr = _tail_matrix(lof_cols, codes, "amount_incr", 3)
+    pct = _tail_matrix(lof_cols, codes, "price_pct", 1)[:, 0]
+    mean5, std5, mean10, std10, mean15, std15 = stats.T
+
+    # ================= 溢价率维度 =================
+    cur = disc[:, -1]
+    last3 = disc[:, -3:]
+    last3_min = last3.min(axis=1)
+    last3_diff = np.diff(last3, axis=1)
+    rising_3d = (last3_diff > 0).all(axis=1)
+    falling_3d = (last3_diff < 0).all(axis=1)
+
+    discount = cur < 0
+    missing = np.isnan(cur)
+    active = ~discount & ~missing
+
+    rules = {
+        Reason.ABOVE_5D_MEAN: active & (cur > mean5 + std5),
+        Reason.ABOVE_10D_MEAN: active & (cur - mean10 > std10 * 1.5),
+        Reason.ABOVE_15D_MEAN: active & (cur - mean15 > std15 * 2),
+        Reason.PREMIUM_10_20: active & (10 <= cur) & (cur < 20),
+        Reason.PREMIUM_ABOVE_20: active & (cur >= 20),
+        Reason.RISING_ABOVE_5_3D: active & (last3_min >= 5) & rising_3d,
+        Reason.ABOVE_5_3D: active & (last3_min >= 5) & ~rising_3d,
+        Reason.ABOVE_3_3D: active & (last3_min >= 3) & ~(last3_min >= 5),
+        Reason.FALLING_3D: active & falling_3d,
+        Reason.BELOW_YESTERDAY: active & ~falling_3d & (disc[:, -1] < disc[:, -2]),
+        Reason.NEAR_LIMIT_DOWN: active & (pct <= -9.5),
+        Reason.DROP_8PCT: active & (pct > -9.5) & (pct <= -8),
+        Reason.DROP_5PCT: active & (pct > -8) & (pct <= -5),
+    }
+    premium_points = {
+        Reason.ABOVE_5D_MEAN: 5, Reason.ABOVE_10D_MEAN: 5, Reason.ABOVE_15D_MEAN: 5,
+        Reason.PREMIUM_10_20: 10, Reason.PREMIUM_ABOVE_20: 20,
+        Reason.RISING_ABOVE_5_3D: 15, Reason.ABOVE_5_3D: 10, Reason.ABOVE_3_3D: 5,
+        Reason.FALLING_3D: -10, Reason.BELOW_YESTERDAY: -5,
+        Reason.NEAR_LIMIT_DOWN: -20, Reason.DROP_8PCT: -15, Reason.DROP_5PCT: -10,
+    }
+
+    base = np.where(cur >= 5, 60, np.trunc(np.where(active, cur, 0) * 10))
+    premium_score = np.where(active, base, 0)
+    for reason, points in premium_points.items():
+        premium_score = premium_score + np.where(rules[reason], points, 0)
+    premium_score = np.maximum(0, 0.6*np.minimum(100, premium_score))
+
+    # ================= 流动性维度 =================
+    window = slice(-4, -1) if pre_order else slice(-3, None)
+    liquid = (volume[:, window] >= 1000).all(axis=1) & (amount[:, window] >= 1000).all(axis=1)
+    incr_today = amount_incr[:, -1]
+
+    rules[Reason.LIQUIDITY_OK] = liquid
+    rules[Reason.SHARES_STABLE_TODAY] = liquid & (np.abs(incr_today) < 1)
+    rules[Reason.SHARES_STABLE_3D] = liquid & (-1 < amount_incr.min(axis=1)) & (amount_incr.max(axis=1) < 1)
+    rules[Reason.ARBITRAGE_EXIT] = liquid & (incr_today > 3) & falling_3d
+
+    liquidity_score = (
+        np.where(rules[Reason.LIQUIDITY_OK], 60, 0)
+        + np.where(rules[Reason.SHARES_STABLE_TODAY], 5, 0)
+        + np.where(rules[Reason.SHARES_STABLE_3D], 15, 0)
+        - np.where(rules[Reason.ARBITRAGE_EXIT], 20, 0)
+    )
+    liquidity_score = np.maximum(0, 0.5*np.minimum(80, liquidity_score))
+
+    scores = (premium_score + liquidity_score).astype(np.int64)
+    plus_bits = _flags(*[(mask, r) for r, mask in rules.items() if r in PLUS_REASONS])
+    minus_bits = _flags(
+        (discount, Reason.DISCOUNT),
+        (missing, Reason.PREMIUM_MISSING),
+        (~liquid, Reason.LOW_LIQUIDITY),
+        *[(mask, r) for r, mask in rules.items() if r in MINUS_REASONS]
+    )
+
+    # 历史过短的代码按原逐个规则重算
+    for i, code in enumerate(codes):
+        cols = lof_cols[code]
+        if len(cols["discount_rt"]) < 4:
+            scores[i], plus_bits[i], minus_bits[i] = _score_kernel(
+                cols["discount_rt"], cols["volume"], cols["amount"],
+                cols["amount_incr"], cols["price_pct"], pre_order, stats[i]
+            )
+    return scores, plus_bits, minus_bits
+
 @st.cache_data(ttl=30, show_spinner=False) 
 def get_last_sync_time():
     """
@@ -76,6 +414,82 @@ def get_last_sync_time():
 # 分析器
 # ======================================================
 
+@st.cache_data(max_entries=1000, show_spinner=False)
+def load_lof_file(file_path, mtime):
+    """以 (路径, 修改时间) 为键缓存单个LOF文件，文件未变化时不再重新解析"""
+    df = read_lof_csv_incremental(file_path, LOF_USECOLS)
+    price = df["price"].to_numpy()
+    price_pct = np.empty_like(price)
+    price_pct[:1] = np.nan
+    price_pct[1:] = (price[1:] / price[:-1] - 1) * 100
+    # 增量缓存中的 DataFrame 是共享的，派生列用 assign 生成新对象
+    # 溢价率补齐和日期字符串随文件缓存，页面重跑时不再重复计算
+    df = df.assign(
+        price_pct=price_pct,
+        discount_rt=df['discount_rt'].fillna(((df['price'] / df['est_val'] - 1) * 100).round(2)),
+        nv=df['net_value'].fillna(df['est_val']),
+        price_dt_str=df['price_dt'].dt.strftime('%Y-%m-%d')
+    )
+    # 图表均线同样在加载时一次算好，渲染时只取列
+    return df.assign(**{
+        f'{col}_ma{window}': df[col].rolling(window).mean()
+        for col in MA_COLUMNS for window, _ in MA_STYLES
+    })
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def load_lof_columns(file_path, mtime):
+    """单个LOF文件的列数组（SoA），同样按修改时间缓存"""
+    return to_soa(load_lof_file(file_path, mtime))
+
+def _to_float(value):
+    """CSV 中的数值字段，空值返回 NaN"""
+    return float(value) if value else np.nan
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_purchase_map(path):
+    """基金申购信息：代码 -> {简称, 申购/赎回状态, 限额, 手续费}，不经过 DataFrame"""
+    purchase_info_map = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            purchase_info_map[row["基金代码"]] = {
+                "fund_name": row["基金简称"],
+                "purchase_status": row["申购状态"] or None,
+                "redeem_status": row["赎回状态"] or None,
+                "purchase_limit": _to_float(row["日累计限定金额"]),
+                "fee_pct": _to_float(row["手续费"])
+            }
+    return purchase_info_map
+
+def get_signals_cache_path() -> str:
+    """评分结果的磁盘缓存文件，进程重启后仍可复用"""
+    return os.path.join(get_project_root(), ".cache", "lof_signals.pkl")
+
+def load_signals_cache(key):
+    """键一致时返回缓存的信号列表，否则返回 None"""
+    try:
+        with open(get_signals_cache_path(), "rb") as f:
+            cached_key, signals = pickle.load(f)
+    except Exception:
+        return None
+    return signals if cached_key == key else None
+
+def save_signals_cache(key, signals):
+    """只保留最新一份结果；先写临时文件再替换，避免读到半截文件"""
+    path = get_signals_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, signals), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"写入评分缓存失败: {e}")
+
+@st.cache_resource(show_spinner=False)
+def get_analyzer(data_dir="data"):
+    """分析器本身无状态，数据由缓存方法负责刷新，每个进程只构建一次"""
+    return LOFArbitrageAnalyzer(data_dir)
+
 class LOFArbitrageAnalyzer:
 
     def __init__(self, data_dir="data"):
@@ -83,188 +497,51 @@ class LOFArbitrageAnalyzer:
         # 不再在这里初始化 lof_data
 
     @staticmethod
-    @st.cache_data(ttl=300, show_spinner=False)
-    def load_all_data(data_dir):
-        """加载所有LOF数据 (静态缓存方法)"""
-        csv_files = [f for f in os.listdir(data_dir)
-                    if f.startswith('lof_') and f.endswith('.csv')]
-        lof_data = {}
-        for file in csv_files:
-            code = file.replace('lof_', '').replace('.csv', '')
-            file_path = os.path.join(data_dir, file)
+    def file_key(data_dir, code):
+        """单个LOF文件的 (路径, 修改时间)，即逐文件缓存的键；文件不存在时返回 None"""
+        file_path = os.path.join(data_dir, f"lof_{code}.csv")
+        if not os.path.exists(file_path):
+            return None
+        return file_path, os.path.getmtime(file_path)
+
+    @staticmethod
+    def load_columns(data_dir):
+        """按代码取列数组（SoA），供评分使用；图表经 file_key 由 load_lof_file 逐文件读取 DataFrame
+        评分已整批向量化，剩余的逐基金工作是缓存未命中时的文件读取与解析，交给线程池并发"""
+        def load(entry):
+            code, file_path, mtime = entry
             try:
-                df = pd.read_csv(file_path)
-                df['price_dt'] = pd.to_datetime(df['price_dt'])
-                df['discount_rt'] = pd.to_numeric(df['discount_rt'], errors='coerce')
-                df["price_pct"] = df["price"].pct_change() * 100
-                df['discount_rt'] = df['discount_rt'].fillna(((df['price'] / df['est_val'] - 1) * 100).round(2))
-                lof_data[code] = df.sort_values('price_dt')
+                return code, load_lof_columns(file_path, mtime)
             except Exception as e:
                 print(f"加载 {code} 数据失败: {e}")
-        return lof_data
-
-    def premium_stats(self, df, days):
-        d = df.tail(days)
-        return {
-            "mean": d["discount_rt"].mean(),
-            "std": d["discount_rt"].std()
-        }
-
-    def score_one_lof(self, lof_data, code):
-        # 修改：将 lof_data 作为参数传入，而不是从 self 获取
-        df = lof_data[code].copy()
-        recent = df.tail(30)
-
-        current = recent.iloc[-1]
-        cur_premium = current["discount_rt"]
-        cur_volume = current["volume"]
-        cur_pct = current["price_pct"]
+                return code, None
 
-        stats7 = self.premium_stats(df, 5)
-        stats14 = self.premium_stats(df, 10)
-        stats21 = self.premium_stats(df, 15)
-
-        # ================= 溢价率维度 =================
-        premium_score = 0
-        plus, minus = [], []
-        
-        if cur_premium < 0:
-            minus.append("当前为折价，不适用溢价套利策略")
-        elif pd.notna(cur_premium):
-            premium_score += 60 if cur_premium >= 5 else int(cur_premium * 10)
-
-            if cur_premium > stats7["mean"] + stats7["std"]:
-                premium_score += 5
-                plus.append(f"当前溢价率显著高于5日均值")
-
-            if cur_premium - stats14["mean"] > stats14["std"] * 1.5:
-                premium_score += 5
-                plus.append("当前溢价率显著高于10日均值")
-
-            if cur_premium - stats21["mean"] > stats21["std"] * 2:
-                premium_score += 5
-                plus.append("当前溢价率显著高于15日均值")
-
-            if 10 <= cur_premium < 20:
-                premium_score += 10
-                plus.append("当前溢价率处于10–20%，套利空间充足")
-            elif cur_premium >= 20:
-                premium_score += 20
-                plus.append("当前溢价率 ≥20%，属于极端溢价空间")
-
-            last3 = recent["discount_rt"].tail(3).values
-
-            if (last3 >= 5).all() and is_monotonic_increasing(last3):
-                premium_score += 15
-                plus.append(
-                    "近3日溢价率均 ≥5%且逐日上升，套利空间稳步扩张"
-                )
-            elif (last3 >= 5).all():
-                premium_score += 10
-                plus.append(
-                    "近3日溢价率均 ≥5%，套利空间稳定存在"
-                )
-            elif (last3 >= 3).all():
-                premium_score += 5
-                plus.append(
-                    "近3日溢价率维持在3%–5%，具备溢价套利基础"
-                )
-
-            if is_monotonic_decreasing(last3):
-                premium_score -= 10
-                minus.append(
-                    "溢价率近3日逐日下降，短期套利窗口收敛"
-                )
-            elif recent["discount_rt"].iloc[-1] < recent["discount_rt"].iloc[-2]:
-                premium_score -= 5
-                minus.append(
-                    "溢价率较昨日有所下滑，但尚未连续回落，短期套利动能减弱"
-                )
-
-            if cur_pct <= -9.5:
-                premium_score -= 20
-                minus.append(
-                    "场内价格接近跌停，情绪化抛压显著，套利风险极高"
-                )
-            elif cur_pct <= -8:
-                premium_score -= 15
-                minus.append(
-                    "场内价格跌超8%，恐慌性下跌阶段，溢价稳定性存疑"
-                )
-            elif cur_pct <= -5:
-                premium_score -= 10
-                minus.append(
-                    "场内价格跌超5%，短期情绪偏弱，需防止溢价快速回落"
-                )
-        else:
-            minus.append("当日溢价率缺失，无法进一步分析")
-
-        premium_score = max(0, 0.6*min(100, premium_score))
-
-        # ================= 流动性维度 =================
-        liquidity_score = 0
-
-        # ---------- 基础流动性门槛 ----------
-        if is_pre_order_time():
-            liquidity_window = recent.iloc[-4:-1]   # 不含今日
-        else:
-            liquidity_window = recent.iloc[-3:]     # 含今日
-
-        if len(liquidity_window) == 3 and \
-        (liquidity_window["volume"] >= 1000).all() and \
-        (liquidity_window["amount"] >= 1000).all():
-
-            liquidity_score += 60
-            plus.append("近3日成交额均 ≥1000万元，场内份额均 ≥1000万份，具备套利执行基础")
-
-            # ---------- 加分条件：份额稳定性 ----------
-            amount_incr_today = current["amount_incr"]
-            last3_amount_incr = recent["amount_incr"].tail(3).values
-
-            if abs(amount_incr_today) < 1:
-                liquidity_score += 5
-                plus.append(
-                    "当日场内份额增速绝对值 <1%，套利盘未明显集中进出"
-                )
-
-            if (np.abs(last3_amount_incr) < 1).all():
-                liquidity_score += 15
-                plus.append(
-                    "近3日份额增速绝对值均 <1%，份额结构高度稳定"
-                )
-
-            # ---------- 扣分条件：套利机会快速消失 ----------
-            last3_premium = recent["discount_rt"].tail(3).values
-
-            if amount_incr_today > 3 and is_monotonic_decreasing(last3_premium):
-                liquidity_score -= 20
-                minus.append(
-                    "当日场内份额增速 >3% 且溢价率连续回落，套利盘加速撤离"
-                )
-
-        else:
-            minus.append(
-                "近3日成交额或场内份额不足，存在较大的流动性风险，套利需谨慎"
-            )
-
-        liquidity_score = max(0, 0.5*min(80, liquidity_score))
-
-        total_score = int(premium_score + liquidity_score)
+        files = list(iter_lof_files(data_dir))
+        with ThreadPoolExecutor(max_workers=min(8, len(files) or 1)) as pool:
+            loaded = list(pool.map(load, files))
+        return {code: cols for code, cols in loaded if cols is not None}
 
+    @staticmethod
+    def build_signal(cols, code, total_score, plus_bits, minus_bits):
+        # 一次取出所需列数组，之后只做下标访问
+        premiums, volume, price_pct = SIGNAL_COLUMNS(cols)
+        last5 = premiums[-5:]
+        total_score = int(total_score)
         return {
             "code": code,
             "score": total_score,
             "signal": score_to_signal(total_score),
-            "current_premium": cur_premium,
-            "current_volume": cur_volume,
-            "price_pct": cur_pct,
+            "current_premium": float(premiums[-1]),
+            "current_volume": float(volume[-1]),
+            "price_pct": float(price_pct[-1]),
             "key_metrics": {
-                "premium_3d": recent["discount_rt"].tail(3).mean(),
-                "premium_5d": recent["discount_rt"].tail(5).mean()
+                "premium_3d": np.nanmean(last5[-3:]),
+                "premium_5d": np.nanmean(last5)
             },
             "reasons": {
-                "plus": plus,
-                "minus": minus
+                # 存为 int，保证 st.cache_data 可序列化
+                "plus": int(plus_bits),
+                "minus": int(minus_bits)
             }
         }
 
@@ -274,39 +551,33 @@ class LOFArbitrageAnalyzer:
         获取所有信号 (缓存方法)
         关键：使用 _self 别名来避免 self 被哈希，并在内部调用静态缓存方法
         """
-        # 1. 通过静态缓存方法加载数据
-        lof_data = _self.load_all_data(_self.data_dir)
-
-        # 2. 读取基金申购信息 (这部分代码你原来就有，可能需要微调路径)
-        project_root = get_project_root()
-        cache_path = get_cache_path(project_root)
-        fund_purchase_df = pd.read_csv(cache_path, dtype={"基金代码": str})
-        fund_purchase_df.rename(columns={
-            "基金代码": "code",
-            "基金简称": "fund_name",
-            "申购状态": "purchase_status",
-            "赎回状态": "redeem_status",
-            "日累计限定金额": "purchase_limit",
-            "手续费": "fee_pct"
-        }, inplace=True)
-        fund_purchase_df["code"] = fund_purchase_df["code"].astype(str)
-        purchase_info_map = (
-            fund_purchase_df
-            .set_index("code")[[
-                "fund_name",
-                "purchase_status",
-                "redeem_status",
-                "purchase_limit",
-                "fee_pct"
-            ]]
-            .to_dict(orient="index")
+        # 0. 进程重启后先查磁盘缓存：数据文件、申购信息文件与申购时段都未变化时直接复用
+        purchase_path = get_cache_path(get_project_root())
+        pre_order = is_pre_order_time()
+        cache_key = (
+            data_version(_self.data_dir),
+            os.path.basename(purchase_path),
+            os.path.getmtime(purchase_path),
+            pre_order
         )
+        signals = load_signals_cache(cache_key)
+        if signals is not None:
+            return signals
+
+        # 1. 通过静态缓存方法加载列数组
+        lof_cols = _self.load_columns(_self.data_dir)
+
+        # 2. 读取基金申购信息（单独缓存，直接得到 代码 -> 信息 的字典）
+        purchase_info_map = load_purchase_map(purchase_path)
+
+        # 3. 全部LOF按矩阵整批评分，逐个代码只做结果组装
+        codes = list(lof_cols)
+        stats = batch_premium_stats(lof_cols, codes)
+        scores, plus_bits, minus_bits = score_batch(lof_cols, codes, pre_order, stats)
 
-        # 3. 为每个LOF计算分数
         signals = []
-        for code in lof_data:
-            # 调用 score_one_lof，并传入当前循环的 lof_data
-            s = _self.score_one_lof(lof_data, code)
+        for i, code in enumerate(codes):
+            s = _self.build_signal(lof_cols[code], code, scores[i], plus_bits[i], minus_bits[i])
             purchase_info = purchase_info_map.get(code, {})
             s["purchase_info"] = {
                 "fund_name": purchase_info.get("fund_name"),
@@ -316,21 +587,144 @@ class LOFArbitrageAnalyzer:
                 "fee_pct": purchase_info.get("fee_pct")
             }
             signals.append(s)
-        return sorted(signals, key=lambda x: x["score"], reverse=True)
+        signals.sort(key=lambda x: x["score"], reverse=True)
+        save_signals_cache(cache_key, signals)
+        return signals
+
+# 套利机会文字颜色：胜率越高，红色越深；放弃为深灰（仅改字体颜色，不改背景）
+SIGNAL_COLORS = {
+    "极高胜率": "#8B0000",   # 深红
+    "高胜率":   "#CD2626",   # 红
+    "中等胜率": "#FF4500",   # 橙红
+    "低胜率":   "#A0522D",   # 棕色
+    "放弃":     "#4F4F4F"    # 深灰
+}
+
+def signal_table_html(df, signal_col="套利机会"):
+    """直接拼出居中的 HTML 表格，信号列按 SIGNAL_COLORS 着色，不经过 pandas Styler"""
+    header = "".join(f"<th>{html.escape(str(c))}</th>" for c in df.columns)
+    signal_idx = df.columns.get_loc(signal_col)
+    rows = []
+    for row in df.itertuples(index=False):
+        cells = []
+        for i, v in enumerate(row):
+            text = html.escape(str(v))
+            if i == signal_idx and v in SIGNAL_COLORS:
+                text = f'<span style="color:{SIGNAL_COLORS[v]}">{text}</span>'
+            cells.append(f"<td>{text}</td>")
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    return (
+        '<table style="width:100%;text-align:center">'
+        f'<thead><tr>{header}</tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table>'
+    )
 
-def signal_font_color(val):
-    """
-    仅修改字体颜色，不修改背景
-    胜率越高，红色越深；放弃为深灰
-    """
-    color_map = {
-        "极高胜率": "color: #8B0000;",   # 深红
-        "高胜率":   "color: #CD2626;",   # 红
-        "中等胜率": "color: #FF4500;",   # 橙红
-        "低胜率":   "color: #A0522D;",   # 棕色
-        "放弃":     "color: #4F4F4F;"    # 深灰
-    }
-    return color_map.get(val, "")
+@st.cache_data(max_entries=200, show_spinner=False)
+def build_chart(file_path, mtime, code, chart_type, show_ma):
+    """按 (文件, 修改时间, 代码, 图表模式, 均线开关) 缓存图表，仅切换界面控件时不再重建"""
+    df = load_lof_file(file_path, mtime)
+    x = df['price_dt_str']
+    n = len(df)
+    # 折线用 WebGL 绘制，只在最近几天画点
+    marker = dict(size=np.where(np.arange(n) >= n - MARKER_TAIL, 6, 0))
+
+    fig = go.Figure()
+
+    if chart_type == "价格 vs 净值":
+        # 左轴：价格、基金净值
+        for mode in ("价格", "净值"):
+            col, name, color, _, _ = CHART_SPECS[mode]
+            fig.add_trace(go.Scattergl(
+                x=x,
+                y=df[col],
+                mode='lines+markers',
+                name=name,
+                line=dict(color=color, width=2),
+                marker=marker,
+                yaxis='y'
+            ))
+
+        # 右轴：溢价率（柱状），只给最近的柱子加数值标注
+        discount = df['discount_rt']
+        labels = discount.round(2).astype(str).where((np.arange(n) >= n - LABEL_TAIL) & discount.notna(), '')
+        fig.add_trace(go.Bar(
+            x=x,
+            y=discount,
+            name='溢价率(右轴)',
+            marker_color=np.where(discount >= 0, 'red', 'green'),
+            opacity=0.6,
+            yaxis='y2',
+            text=labels,
+            textposition='outside'
+        ))
+
+        fig.update_layout(
+            title=f"{code} 价格 vs 净值",
+            # 左轴：价格 & 净值（不画网格）
+            yaxis=dict(
+                title="价格(元)",
+                showgrid=False,
+                zeroline=False
+            ),
+            # 右轴：溢价率（唯一的辅助线来源）
+            yaxis2=dict(
+                title="溢价率(%)",
+                overlaying='y',
+                side='right',
+                showgrid=True,    # 只画右轴网格
+                gridcolor='rgba(200,200,200,0.45)',
+                zeroline=True,
+                zerolinecolor='rgba(120,120,120,0.6)'
+            ),
+            height=400
+        )
+    else:
+        col, name, color, title, y_title = CHART_SPECS[chart_type]
+        fig.add_trace(go.Scattergl(
+            x=x,
+            y=df[col],
+            mode='lines+markers',
+            name=name,
+            line=dict(color=color, width=2),
+            marker=marker
+        ))
+
+        for (window, ma_color), show in zip(MA_STYLES, show_ma):
+            if show:
+                fig.add_trace(go.Scattergl(
+                    x=x,
+                    y=df[f'{col}_ma{window}'],
+                    mode='lines',
+                    name=f'{window}日均线',
+                    line=dict(color=ma_color, dash='dash')
+                ))
+
+        fig.update_layout(
+            title=f"{code} {title}",
+            yaxis_title=y_title,
+            height=400
+        )
+
+    # 公共布局（x轴重点修正）
+    fig.update_layout(
+        xaxis=dict(
+            type='category',
+            tickmode='auto',
+            nticks=8,
+            tickangle=0,
+            tickfont=dict(size=12)
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.08,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=14)
+        ),
+        margin=dict(t=80)
+    )
+    return fig
 
 # ======================================================
 # Streamlit 页面
@@ -343,15 +737,13 @@ def main():
         page_icon="📈",
         layout="wide"
     )
-    st.cache_data.clear()
     st.title("📈 LOF 溢价套利【每日机会】")
     st.markdown("### 基于行情数据，寻找套利机会，盘中定时更新")
     st.caption(f"👉 交易日更新时点：09:30，10:30，11:30，13:30，14:00，14:15，14:30，14:45，15:00，21:00")
     st.caption(f"🚀 场内申购建议：**14:00-14:30 观察筛选，14:30-15:00 完成交易**，尽量使盘中估值≈当日净值")
     st.caption(f"🕒 最后更新时间：{get_last_sync_time()}")
     
-    analyzer = LOFArbitrageAnalyzer()
-    lof_data = analyzer.load_all_data(analyzer.data_dir)
+    analyzer = get_analyzer()
     all_signals = analyzer.get_all_signals()
 
     # ========= 新：默认展示逻辑 =========
@@ -367,7 +759,16 @@ def main():
     # ================= 侧边栏 =================
     with st.sidebar:
         st.header("🔧 设置")
-        all_codes = list(lof_data.keys())
+        # 缓存依赖 ttl 与文件修改时间自动失效，需要立即重算时手动清空
+        if st.button("🔄 刷新数据"):
+            load_lof_file.clear()
+            load_lof_columns.clear()
+            LOFArbitrageAnalyzer.get_all_signals.clear()
+            if os.path.exists(get_signals_cache_path()):
+                os.remove(get_signals_cache_path())
+            st.rerun()
+        # 评分结果已覆盖全部代码，无需为取代码列表再加载一遍 DataFrame
+        all_codes = [s["code"] for s in all_signals]
 
         selected_codes = st.multiselect(
             "选择LOF代码",
@@ -381,26 +782,21 @@ def main():
     col_left, col_right = st.columns([2, 1])
 
     with col_left:
-        top_df = pd.DataFrame([{
-            "基金代码": s["code"],
-            "基金简称": s["purchase_info"]["fund_name"],
-            "当前溢价": f"{s['current_premium']:.2f}%",
-            "当前成交": f"{int(s['current_volume'])}万",
-            "申购状态": s["purchase_info"]["purchase_status"],
-            "赎回状态": s["purchase_info"]["redeem_status"],
-            "手续费": f"{s['purchase_info']['fee_pct']:.2f}%",      
-            "套利机会": s["signal"],
-            "综合得分": f"{s['score']:.0f}"
-        } for s in default_signals])
-
-        styled_top_df = (
-            top_df
-            .style
-            .set_properties(**{"text-align": "center"})
-            .applymap(signal_font_color, subset=["套利机会"])
-        )
-
-        st.dataframe(styled_top_df, use_container_width=True)
+        # 按列构造，避免逐行 dict 再由 pandas 推断类型
+        infos = [s["purchase_info"] for s in default_signals]
+        top_df = pd.DataFrame({
+            "基金代码": [s["code"] for s in default_signals],
+            "基金简称": [p["fund_name"] for p in infos],
+            "当前溢价": [f"{s['current_premium']:.2f}%" for s in default_signals],
+            "当前成交": [f"{int(s['current_volume'])}万" for s in default_signals],
+            "申购状态": [p["purchase_status"] for p in infos],
+            "赎回状态": [p["redeem_status"] for p in infos],
+            "手续费": [f"{p['fee_pct']:.2f}%" for p in infos],
+            "套利机会": [s["signal"] for s in default_signals],
+            "综合得分": [f"{s['score']:.0f}" for s in default_signals]
+        })
+
+        st.markdown(signal_table_html(top_df), unsafe_allow_html=True)
         st.caption("注：当日基金净值公布前，**当前溢价**根据**实时估值**计算。")
 
     with col_right:
@@ -444,11 +840,11 @@ def main():
 
             with c3:
                 st.write("**加分项**")
-                for r in s["reasons"]["plus"]:
+                for r in reasons_to_text(s["reasons"]["plus"]):
                     st.write(f"➕ {r}")
                 if s["reasons"]["minus"]:
                     st.write("**扣分项**")
-                    for r in s["reasons"]["minus"]:
+                    for r in reasons_to_text(s["reasons"]["minus"]):
                         st.write(f"➖ {r}")
 
     # ================= 原底部趋势图 =================
@@ -475,240 +871,24 @@ def main():
             show_14d = cols[1].checkbox("10日均线", True, key="chart_14d")
             show_21d = cols[2].checkbox("15日均线", False, key="chart_21d")
         
-        if selected_code in lof_data:
-            df = lof_data[selected_code]
-            df['discount_rt'] = df['discount_rt'].fillna(((df['price'] / df['est_val'] - 1) * 100).round(2))
-            df['price_dt_str'] = df['price_dt'].dt.strftime('%Y-%m-%d')
-            
-            fig = go.Figure()
-            
-            # ==========================
-            # 价格 vs 净值
-            # ==========================
-            if chart_type == "价格 vs 净值":
-                # 左轴：价格
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt_str'],
-                    y=df['price'],
-                    mode='lines+markers',
-                    name='价格',
-                    line=dict(color='#E3B341', width=2),
-                    yaxis='y'
-                ))
-            
-                # 左轴：基金净值
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt_str'],
-                    y=df['net_value'].fillna(df['est_val']),
-                    mode='lines+markers',
-                    name='净值',
-                    line=dict(color='#8b5a2b', width=2),
-                    yaxis='y'
-                ))
-            
-                # 右轴：溢价率（柱状）
-                colors = ['red' if v >= 0 else 'green' for v in df['discount_rt']]
-                fig.add_trace(go.Bar(
-                    x=df['price_dt_str'],
-                    y=df['discount_rt'],
-                    name='溢价率(右轴)',
-                    marker_color=colors,
-                    opacity=0.6,
-                    yaxis='y2',
-                    text=df['discount_rt'].round(2),
-                    textposition='outside'
-                ))
-            
-                fig.update_layout(
-                    title=f"{selected_code} 价格 vs 净值",
-                    # 左轴：价格 & 净值（不画网格）
-                    yaxis=dict(
-                        title="价格(元)",
-                        showgrid=False,
-                        zeroline=False
-                    ),
-                
-                    # 右轴：溢价率（唯一的辅助线来源）
-                    yaxis2=dict(
-                        title="溢价率(%)",
-                        overlaying='y',
-                        side='right',
-                        showgrid=True,    # 只画右轴网格
-                        gridcolor='rgba(200,200,200,0.45)',
-                        zeroline=True,
-                        zerolinecolor='rgba(120,120,120,0.6)'
-                    ),
-                    
-                    height=400
-                )
-                
-            # ==========================
-            # 溢价率
-            # ==========================            
-            elif chart_type == "溢价率": 
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt_str'],
-                    y=df['discount_rt'],
-                    mode='lines+markers',
-                    name='溢价率',
-                    line=dict(color='blue', width=2)
-                ))
-            
-                if show_7d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['discount_rt'].rolling(5).mean(),
-                        mode='lines',
-                        name='5日均线',
-                        line=dict(color='red', dash='dash')
-                    ))
-            
-                if show_14d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['discount_rt'].rolling(10).mean(),
-                        mode='lines',
-                        name='10日均线',
-                        line=dict(color='green', dash='dash')
-                    ))
-            
-                if show_21d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['discount_rt'].rolling(15).mean(),
-                        mode='lines',
-                        name='15日均线',
-                        line=dict(color='orange', dash='dash')
-                    ))
-            
-                fig.update_layout(
-                    title=f"{selected_code} 溢价趋势",
-                    yaxis_title="溢价率(%)",
-                    height=400
-                )
-            
-            # ==========================
-            # 价格
-            # ==========================
-            elif chart_type == "价格":
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt_str'],
-                    y=df['price'],
-                    mode='lines+markers',
-                    name='价格',
-                    line=dict(color='#E3B341', width=2)
-                ))
-            
-                if show_7d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['price'].rolling(5).mean(),
-                        mode='lines',
-                        name='5日均线',
-                        line=dict(color='red', dash='dash')
-                    ))
-            
-                if show_14d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['price'].rolling(10).mean(),
-                        mode='lines',
-                        name='10日均线',
-                        line=dict(color='green', dash='dash')
-                    ))
-            
-                if show_21d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['price'].rolling(15).mean(),
-                        mode='lines',
-                        name='15日均线',
-                        line=dict(color='orange', dash='dash')
-                    ))
-            
-                fig.update_layout(
-                    title=f"{selected_code} 价格趋势",
-                    yaxis_title="价格(元)",
-                    height=400
-                )
-            
-            # ==========================
-            # 净值
-            # ==========================
-            else:
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt_str'],
-                    y=df['net_value'].fillna(df['est_val']),
-                    mode='lines+markers',
-                    name='净值',
-                    line=dict(color='#8b5a2b', width=2)
-                ))
-            
-                if show_7d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['net_value'].fillna(df['est_val']).rolling(5).mean(),
-                        mode='lines',
-                        name='5日均线',
-                        line=dict(color='red', dash='dash')
-                    ))
-            
-                if show_14d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['net_value'].fillna(df['est_val']).rolling(10).mean(),
-                        mode='lines',
-                        name='10日均线',
-                        line=dict(color='green', dash='dash')
-                    ))
-            
-                if show_21d:
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt_str'],
-                        y=df['net_value'].fillna(df['est_val']).rolling(15).mean(),
-                        mode='lines',
-                        name='15日均线',
-                        line=dict(color='orange', dash='dash')
-                    ))
-            
-                fig.update_layout(
-                    title=f"{selected_code} 净值趋势",
-                    yaxis_title="净值(元)",
-                    height=400
-                )
-            
-            # ==========================
-            # 公共布局（x轴重点修正）
-            # ==========================
-            fig.update_layout(
-                xaxis=dict(
-                    type='category',
-                    tickmode='auto',
-                    nticks=8,
-                    tickangle=0,
-                    tickfont=dict(size=12)
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.08,
-                    xanchor="center",
-                    x=0.5,
-                    font=dict(size=14)
-                ),
-                margin=dict(t=80)
-            )
-            
+        file_key = analyzer.file_key(analyzer.data_dir, selected_code)
+        if file_key is not None:
+            df = load_lof_file(*file_key)
+            fig = build_chart(*file_key, selected_code, chart_type, (show_7d, show_14d, show_21d))
             st.plotly_chart(fig, use_container_width=True)
 
         with st.expander("🧮 详细数据", expanded=True):
-            display_df = df[['fund_id','price_dt','price','net_value','est_val','discount_rt','volume','amount','amount_incr']].copy()
-            display_df["price_dt"] = display_df["price_dt"].dt.strftime("%Y-%m-%d")
-            display_df['price_pct'] = (display_df["price"].pct_change()*100).apply(lambda x: format(x,'.2f'))
-            display_df = display_df[['fund_id','price_dt','price','net_value','est_val','discount_rt','price_pct','volume','amount','amount_incr']]
+            # 只取最后10行再做格式化，不复制整段历史
+            display_df = df[['fund_id','price_dt_str','price','net_value','est_val','discount_rt','price_pct','volume','amount','amount_incr']].tail(10)
+            display_df = display_df.assign(
+                # 涨跌幅沿用加载时算好的 price_pct，只做格式化
+                price_pct=display_df['price_pct'].map('{:.2f}'.format),
+                # float32 列转回两位小数展示，避免出现 5.840000152 之类的尾数
+                **{col: display_df[col].astype('float64').round(2) for col in ('volume', 'amount', 'amount_incr')}
+            )
             display_df.columns = ['基金代码', '交易日期', '现价', '基金净值', '实时估值', '溢价率(%)', '涨跌幅(%)','成交(万元)','场内份额(万份)','场内新增(万份)']
 
-            st.dataframe(display_df.tail(10), use_container_width=True)
+            st.dataframe(display_df, use_container_width=True)
 
     # ================= 套利操作 =================
     current_dir = os.path.dirname(os.path.abspath(__file__))
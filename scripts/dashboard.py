@@ -9,15 +9,59 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from utils.data_manager import DataManager
+from utils.lof_io import MARKER_TAIL, downsample, read_lof_csv
+from utils.streamlit_cache import dataset_version
 from streamlit_autorefresh import st_autorefresh
 
+def fill_discount(df: pd.DataFrame) -> pd.Series:
+    """未确认的溢价率按实时估值整列补齐"""
+    return df['discount_rt'].fillna((df['price'] / df['est_val'] - 1) * 100)
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def load_lof_cached(data_dir: str, code: str, mtime: float) -> pd.DataFrame:
+    """以 (目录, 代码, 修改时间) 为键缓存 load_lof_data，文件变化后键随之变化"""
+    df = DataManager(data_dir).load_lof_data(code)
+    if not df.empty:
+        df['discount_rt'] = fill_discount(df)
+    return df
+
+def load_lof(manager: DataManager, code: str) -> pd.DataFrame:
+    """同一次运行及跨运行的重复加载都命中缓存"""
+    file_path = os.path.join(manager.data_dir, f"lof_{code}.csv")
+    mtime = os.path.getmtime(file_path) if os.path.exists(file_path) else 0.0
+    return load_lof_cached(manager.data_dir, code, mtime)
+
+# 信号与排序列表只用到这些列
+FRAME_COLUMNS = ['price_dt', 'price', 'est_val', 'discount_rt']
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_lof_frame(data_dir: str, codes: tuple, version) -> pd.DataFrame:
+    """所选代码一次读入并拼成一张带 code 列的长表：
+    解析时即确定数值类型与日期，整张表只缓存、反序列化一次；version 仅用作缓存键"""
+    frames = []
+    for code in codes:
+        try:
+            df = read_lof_csv(os.path.join(data_dir, f"lof_{code}.csv"), FRAME_COLUMNS)
+        except Exception as e:
+            print(f"❌ 加载 {code} 失败: {e}")
+            continue
+        frames.append(df.assign(code=code, discount_rt=fill_discount(df)))
+    if not frames:
+        return pd.DataFrame(columns=FRAME_COLUMNS + ['code'])
+    return pd.concat(frames, ignore_index=True)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def get_summary_cached(data_dir: str, version) -> dict:
+    """数据汇总需要读遍所有文件，按 (文件数, 最新修改时间) 缓存"""
+    return DataManager(data_dir).get_data_summary()
+
 def main():
     st_autorefresh(interval=5 * 60 * 1000, key="auto_refresh") # ✅ 5min自动刷新（最先执行）
-    st.cache_data.clear()   # 👈 强制每次重算
     st.set_page_config(
         page_title="LOF溢价率交易仪表板2",
         page_icon="📈",
@@ -34,7 +78,7 @@ def main():
         st.header("🔧 设置")
         
         # 获取所有LOF代码
-        summary = manager.get_data_summary()
+        summary = get_summary_cached(manager.data_dir, dataset_version(manager.data_dir))
         all_codes = list(summary['latest_dates'].keys())
         
         selected_codes = st.multiselect(
@@ -43,6 +87,10 @@ def main():
             default=all_codes[:min(5, len(all_codes))] if all_codes else []
         )
     
+    # 所选代码一次性加载，信号与排序列表共用
+    frame = load_lof_frame(manager.data_dir, tuple(selected_codes), dataset_version(manager.data_dir))
+    lof_frames = {code: df for code, df in frame.groupby('code', sort=False)}
+    
     # 主要内容区域
     col1, col2, col3 = st.columns([2, 1, 1])
     
@@ -53,14 +101,14 @@ def main():
             signals = []
             
             for code in selected_codes:
-                df = manager.load_lof_data(code)
-                if not df.empty:
-                    # 计算7日溢价率统计
-                    recent_7d = df.tail(7)
+                df = lof_frames.get(code)
+                if df is not None and not df.empty:
+                    # 计算7日溢价率统计：溢价率已补齐，直接对数组尾部切片
+                    recent_7d = df['discount_rt'].to_numpy()[-7:]
                     if len(recent_7d) >= 7:
-                        current = (recent_7d.iloc[-1]['price']/ recent_7d.iloc[-1]['est_val']-1)*100 if pd.isna(recent_7d.iloc[-1]['discount_rt']) else recent_7d.iloc[-1]['discount_rt'] #recent_7d.iloc[-1]['discount_rt']
-                        mean_7d = recent_7d['discount_rt'].mean()
-                        std_7d = recent_7d['discount_rt'].std()
+                        current = recent_7d[-1]
+                        mean_7d = np.nanmean(recent_7d)
+                        std_7d = np.nanstd(recent_7d, ddof=1)
                         
                         # 生成简单信号
                         if current < mean_7d - std_7d:
@@ -75,7 +123,8 @@ def main():
                             'current': current,
                             'mean_7d': mean_7d,
                             'signal': signal,
-                            'latest_date': df['price_dt'].max().strftime('%Y-%m-%d')
+                            # 读取时已按日期排序，最后一行即最新日期
+                            'latest_date': df['price_dt'].iat[-1].strftime('%Y-%m-%d')
                         })
             
             if signals:
@@ -96,12 +145,12 @@ def main():
         if selected_codes:
             data = []
             for code in selected_codes:
-                df = manager.load_lof_data(code)
-                if not df.empty:
+                df = lof_frames.get(code)
+                if df is not None and not df.empty:
                     latest = df.iloc[-1]
                     data.append({
                         '代码': code,
-                        '当前溢价': f"{(latest['price']/ latest['est_val']-1)*100 if pd.isna(latest['discount_rt']) else latest['discount_rt']:.2f}%",
+                        '当前溢价': f"{latest['discount_rt']:.2f}%",
                         '收盘价': f"{latest['price']:.3f}",
                         '日期': latest['price_dt'].strftime('%m-%d')
                     })
@@ -113,7 +162,6 @@ def main():
     with col3:
         st.header("📈 系统状态")
         
-        summary = manager.get_data_summary()
         st.metric("总LOF数量", summary['total_lofs'])
         st.metric("总记录数", summary['total_records'])
         
@@ -134,26 +182,28 @@ def main():
     if selected_codes:
         selected_code = st.selectbox("选择代码", selected_codes)
         
-        df = manager.load_lof_data(selected_code)
+        df = load_lof(manager, selected_code)
         if not df.empty:
-            if pd.isna(df['discount_rt'].iloc[-1]):
-                df['discount_rt'].iloc[-1] = (df['price'].iloc[-1]/df['est_val'].iloc[-1]-1)*100
-
+            chart_x = downsample(df['price_dt'])
+            # 折线用 WebGL 绘制，只在最近几天画点
+            n = len(chart_x)
+            marker = dict(size=np.where(np.arange(n) >= n - MARKER_TAIL, 6, 0))
             fig = go.Figure()
             
-            fig.add_trace(go.Scatter(
-                x=df['price_dt'],
-                y=df['discount_rt'],
+            fig.add_trace(go.Scattergl(
+                x=chart_x,
+                y=downsample(df['discount_rt']),
                 mode='lines+markers',
+                marker=marker,
                 name='溢价率',
                 line=dict(color='blue', width=2)
             ))
             
             # 添加7日均线
             df['ma7'] = df['discount_rt'].rolling(window=7).mean()
-            fig.add_trace(go.Scatter(
-                x=df['price_dt'],
-                y=df['ma7'],
+            fig.add_trace(go.Scattergl(
+                x=chart_x,
+                y=downsample(df['ma7']),
                 mode='lines',
                 name='7日均线',
                 line=dict(color='red', width=1, dash='dash')
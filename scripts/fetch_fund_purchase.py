@@ -6,12 +6,17 @@
 fund_purchase_em_20251231.csv
 """
 
+import glob
 import os
+import numpy as np
 import pandas as pd
 import akshare as ak
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+# 进程内缓存：当日缓存路径 -> DataFrame
+_DF_CACHE = {}
+
 def today_str() -> str:
     return datetime.now(ZoneInfo("Asia/Shanghai")).strftime("%Y%m%d")
 
@@ -36,28 +41,17 @@ def normalize_purchase_status(df: pd.DataFrame) -> pd.DataFrame:
         < 10000  → 限购500
         >=10000  → 限购10万
     """
-    df = df.copy()
-
     # 确保金额为数值
-    df["日累计限定金额"] = pd.to_numeric(
-        df["日累计限定金额"], errors="coerce"
-    )
-
-    def _rewrite(row):
-        if row["申购状态"] != "限大额":
-            return row["申购状态"]
-
-        limit = row["日累计限定金额"]
-        if pd.isna(limit):
-            return row["申购状态"]
+    amount = pd.to_numeric(df["日累计限定金额"], errors="coerce")
 
-        if limit < 10000:
-            return f"限购{int(limit)}"
-        else:
-            return f"限购{int(limit // 10000)}万"
-
-    df["申购状态"] = df.apply(_rewrite, axis=1)
-    return df
+    # 按掩码整列改写，避免逐行 apply；只复制改写的一列，不再整表深拷贝
+    status = df["申购状态"].copy()
+    mask = status.eq("限大额") & amount.notna()
+    limit = amount[mask].astype("int64")
+    status[mask] = "限购" + limit.where(
+        limit < 10000, limit // 10000
+    ).astype(str) + np.where(limit < 10000, "", "万")
+    return df.assign(日累计限定金额=amount, 申购状态=status)
 
 
 def fetch_or_load_fund_purchase() -> pd.DataFrame:
@@ -70,20 +64,23 @@ def fetch_or_load_fund_purchase() -> pd.DataFrame:
     today = today_str()
     cache_path = get_today_cache_path(project_root)
 
-    # 🔥 关键修复：先清理「非今日」的历史 CSV
-    for fname in os.listdir(project_root):
-        if (
-            fname.startswith("fund_purchase_em_")
-            and fname.endswith(".csv")
-            and today not in fname
-        ):
-            os.remove(os.path.join(project_root, fname))
-            print(f"🗑 已删除历史缓存：{fname}")
-
-    # 再判断今天的缓存是否存在
+    # 先判断今天的缓存是否存在；同一进程内已读过则直接复用
     if os.path.exists(cache_path):
-        print(f"📄 使用当日缓存：{os.path.basename(cache_path)}")
-        return pd.read_csv(cache_path, dtype={"基金代码": str})
+        df = _DF_CACHE.get(cache_path)
+        if df is None:
+            print(f"📄 使用当日缓存：{os.path.basename(cache_path)}")
+            # 缓存保持 CSV（仪表板用 csv 模块直接读取）；按写入时的类型读回，代码与日期不做数值推断
+            df = _DF_CACHE[cache_path] = pd.read_csv(
+                cache_path, dtype={"基金代码": str, "fetch_date": str}, encoding="utf-8-sig"
+            )
+        return df
+
+    # 🔥 关键修复：今日首次拉取前清理「非今日」的历史 CSV（生成今日缓存时已清理过，命中缓存无需再扫目录）
+    for path in glob.glob(os.path.join(project_root, "fund_purchase_em_*.csv")):
+        fname = os.path.basename(path)
+        if today not in fname:
+            os.remove(path)
+            print(f"🗑 已删除历史缓存：{fname}")
 
     print("🌐 今日首次运行，调用 ak.fund_purchase_em()")
 
@@ -96,6 +93,7 @@ def fetch_or_load_fund_purchase() -> pd.DataFrame:
 
     df.to_csv(cache_path, index=False, encoding="utf-8-sig")
     print(f"✅ 已生成缓存文件：{os.path.basename(cache_path)}")
+    _DF_CACHE[cache_path] = df
 
     return df
 
@@ -4,81 +4,182 @@
 """
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import os
+import sys
+import threading
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from streamlit_autorefresh import st_autorefresh
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings('ignore')
 
+# 添加路径以便导入模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lof_io import MARKER_TAIL, data_version, downsample, read_lof_csv
+from utils.streamlit_cache import dataset_version
+
+# 交易信号的磁盘缓存目录，按数据版本命名，进程重启后仍可复用
+SIGNALS_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+
+# 分析、图表与明细表用到的列，其余列不解析
+PREMIUM_COLUMNS = ['fund_id', 'price_dt', 'price', 'net_value', 'est_val', 'discount_rt', 'volume', 'amount', 'amount_incr']
+
+# 溢价率统计窗口（交易日）
+STAT_WINDOWS = (7, 14, 21)
+
+def rolling_means(values, windows: Tuple[int, ...] = STAT_WINDOWS) -> Dict[int, np.ndarray]:
+    """一次前缀和求出多个窗口的移动平均，与 rolling(w).mean() 一致：不足 w 个或窗口内有缺失时为 NaN"""
+    arr = np.asarray(values, dtype=float)
+    isnan = np.isnan(arr)
+    csum = np.concatenate(([0.0], np.cumsum(np.where(isnan, 0.0, arr))))
+    cnan = np.concatenate(([0], np.cumsum(isnan)))
+    
+    means = {}
+    for w in windows:
+        ma = np.full(len(arr), np.nan)
+        if len(arr) >= w:
+            tail = (csum[w:] - csum[:-w]) / w
+            tail[cnan[w:] - cnan[:-w] > 0] = np.nan
+            ma[w - 1:] = tail
+        means[w] = ma
+    return means
+
 class PremiumAnalyzer:
     """溢价率分析器"""
     
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
         self.lof_data = {}
+        self._arr = {}
+        self._files = {}
+        self._failed = set()
+        # 分析器经 st.cache_resource 在会话间共享，读取与写入缓存字典时加锁
+        self._lock = threading.Lock()
         self.load_all_data()
     
+    @property
+    def codes(self) -> List[str]:
+        """全部LOF代码，不触发读取"""
+        return list(self._files)
+    
     def load_all_data(self):
-        """加载所有LOF数据"""
-        csv_files = [f for f in os.listdir(self.data_dir) 
-                    if f.startswith('lof_') and f.endswith('.csv')]
-        
-        for file in csv_files:
-            code = file.replace('lof_', '').replace('.csv', '')
-            file_path = os.path.join(self.data_dir, file)
-            try:
-                df = pd.read_csv(file_path)
-                df['price_dt'] = pd.to_datetime(df['price_dt'])
-                df['discount_rt'] = pd.to_numeric(df['discount_rt'], errors='coerce')
-                if pd.isna(df['discount_rt'].iloc[-1]):
-                    df['discount_rt'].iloc[-1] = round((df['price'].iloc[-1]/df['est_val'].iloc[-1]-1)*100,2)
-                self.lof_data[code] = df.sort_values('price_dt')
-            except Exception as e:
-                print(f"加载 {code} 数据失败: {e}")
+        """登记所有LOF数据文件；CSV 在首次用到时才读取，页面只看少数代码时不必读全部文件"""
+        with self._lock:
+            self.lof_data = {}
+            self._arr = {}
+            self._failed = set()
+            self._files = {
+                f.replace('lof_', '').replace('.csv', ''): os.path.join(self.data_dir, f)
+                for f in os.listdir(self.data_dir)
+                if f.startswith('lof_') and f.endswith('.csv')
+            }
     
-    def calculate_premium_stats(self, code: str, days: int) -> Dict:
-        """计算指定天数的溢价率统计"""
-        if code not in self.lof_data:
+    def _ensure_loaded(self, codes) -> None:
+        """读取尚未加载的代码；C 解析器读文件时释放 GIL，多线程并行读取"""
+        with self._lock:
+            missing = [
+                code for code in codes
+                if code in self._files and code not in self.lof_data and code not in self._failed
+            ]
+            if not missing:
+                return
+            
+            with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+                for code, df in zip(missing, pool.map(self._load_one, missing)):
+                    if df is None:
+                        # 读取失败的代码记下不再重试，_files 保持不变，其他会话可安全遍历
+                        self._failed.add(code)
+                        continue
+                    self.lof_data[code] = df
+                    # 溢价率（已补齐）预先转为 ndarray，单代码统计直接切片，不再经过 pandas
+                    self._arr[code] = df['discount_rt'].to_numpy(dtype=np.float64)
+    
+    def get_data(self, code: str) -> pd.DataFrame:
+        """按需读取单个代码的数据，不存在或读取失败时返回 None"""
+        self._ensure_loaded((code,))
+        return self.lof_data.get(code)
+    
+    def _load_one(self, code: str):
+        """读取单个LOF文件，失败返回 None"""
+        try:
+            # C 解析器按固定类型只读所需列，日期与 "-" 缺失值在解析阶段处理
+            df = read_lof_csv(self._files[code], PREMIUM_COLUMNS)
+            # 未确认的溢价率按实时估值整列补齐，后续统计与图表不再逐处判断
+            df['discount_rt'] = df['discount_rt'].fillna(((df['price'] / df['est_val'] - 1) * 100).round(2))
+            return df
+        except Exception as e:
+            print(f"加载 {code} 数据失败: {e}")
+            return None
+    
+    def _batch_window_stats(self, codes: List[str]) -> Dict[str, Dict[int, Dict]]:
+        """指定代码各窗口的统计，与单代码路径共用 _window_stats_bulk"""
+        self._ensure_loaded(codes)
+        return {code: self._window_stats_bulk(self._arr[code]) for code in codes if code in self._arr}
+    
+    @staticmethod
+    def _window_stats_bulk(arr: np.ndarray, windows: Tuple[int, ...] = STAT_WINDOWS) -> Dict[int, Dict]:
+        """最近 N 个交易日的溢价率统计；各窗口共享同一段尾部，从最新一天向前一次累加得到全部窗口的均值/标准差/极值"""
+        if len(arr) == 0:
             return {}
         
-        df = self.lof_data[code]
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # 获取最近days天的数据
-        recent_data = df[df['price_dt'] >= cutoff_date].copy()
+        current = float(arr[-1])
+        tail = arr[-max(windows):][::-1]
+        valid = ~np.isnan(tail)
+        # 减去一个样本值再累加平方和，避免 s2/n - mean² 的相消误差
+        shift = float(tail[valid][0]) if valid.any() else 0.0
+        dev = np.where(valid, tail - shift, 0.0)
+        csum, csum2, cnt = np.cumsum(dev), np.cumsum(dev * dev), np.cumsum(valid)
+        cmin, cmax = np.fmin.accumulate(tail), np.fmax.accumulate(tail)
         
-        if recent_data.empty:
+        stats = {}
+        for days in windows:
+            i = min(days, len(tail)) - 1
+            n = int(cnt[i])
+            mean = shift + csum[i] / n if n else float('nan')
+            std = float(np.sqrt(max(csum2[i] - csum[i] * csum[i] / n, 0.0) / (n - 1))) if n > 1 else float('nan')
+            stats[days] = {
+                'mean': float(mean),
+                'median': float(np.nanmedian(tail[:i + 1])),
+                'std': std,
+                'min': float(cmin[i]),
+                'max': float(cmax[i]),
+                'current': current,
+                'count': i + 1,
+                'z_score': (current - mean) / std if std else float('nan')
+            }
+        return stats
+    
+    def calculate_premium_stats(self, code: str, days: int) -> Dict:
+        """计算最近 days 个交易日的溢价率统计"""
+        self._ensure_loaded((code,))
+        if code not in self._arr:
             return {}
         
-        return {
-            'mean': float(recent_data['discount_rt'].mean()),
-            'median': float(recent_data['discount_rt'].median()),
-            'std': float(recent_data['discount_rt'].std()),
-            'min': float(recent_data['discount_rt'].min()),
-            'max': float(recent_data['discount_rt'].max()),
-            'current': (recent_data['price'].iloc[-1]/recent_data['est_val'].iloc[-1]-1)*100 if pd.isna(recent_data['discount_rt'].iloc[-1]) else recent_data['discount_rt'].iloc[-1],
-            #float(recent_data['discount_rt'].iloc[-1]) if not recent_data.empty else 0,
-            'count': len(recent_data),
-            'z_score': float(((recent_data['price'].iloc[-1]/recent_data['est_val'].iloc[-1]-1)*100 - recent_data['discount_rt'].mean()) / recent_data['discount_rt'].std()) if pd.isna(recent_data['discount_rt'].iloc[-1]) else float((recent_data['discount_rt'].iloc[-1] - recent_data['discount_rt'].mean()) / recent_data['discount_rt'].std())
-            # float((recent_data['discount_rt'].iloc[-1] - recent_data['discount_rt'].mean()) / recent_data['discount_rt'].std()) if len(recent_data) > 1 else 0
-        }
+        return self._window_stats_bulk(self._arr[code], (days,)).get(days, {})
     
     def get_trading_signal(self, code: str) -> Dict:
         """生成交易信号"""
-        if code not in self.lof_data:
+        self._ensure_loaded((code,))
+        if code not in self._arr:
             return {}
         
-        stats_7d = self.calculate_premium_stats(code, 7)
-        stats_14d = self.calculate_premium_stats(code, 14)
-        stats_21d = self.calculate_premium_stats(code, 21)
-        
-        if not all([stats_7d, stats_14d, stats_21d]):
+        # 7/14/21 日窗口一次算完
+        signal = self._build_signal(code, self._window_stats_bulk(self._arr[code]))
+        if signal:
+            signal['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return signal
+    
+    def _build_signal(self, code: str, stats: Dict[int, Dict]) -> Dict:
+        """由各窗口统计生成交易信号"""
+        if not stats:
             return {}
+        stats_7d, stats_14d, stats_21d = stats[7], stats[14], stats[21]
         
         current = stats_7d['current']
         
@@ -115,23 +216,77 @@ class PremiumAnalyzer:
                 '14d': stats_14d,
                 '21d': stats_21d
             },
-            'reasons': reasons,
-            'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'reasons': reasons
         }
     
-    def get_all_trading_signals(self) -> List[Dict]:
-        """获取所有LOF的交易信号"""
+    def _signals_cache_path(self) -> str:
+        """以 (文件数, 最新修改时间) 命名的信号缓存文件，数据有变化时文件名随之变化"""
+        count, mtime = data_version(self.data_dir)
+        return os.path.join(SIGNALS_CACHE_DIR, f"premium_signals_{count}_{int(mtime * 1e6)}.json")
+    
+    @staticmethod
+    def _cleanup_signals_cache(keep_path: str):
+        """删除非当前版本的信号缓存"""
+        for fname in os.listdir(SIGNALS_CACHE_DIR):
+            path = os.path.join(SIGNALS_CACHE_DIR, fname)
+            if fname.startswith("premium_signals_") and path != keep_path:
+                os.remove(path)
+    
+    def get_all_trading_signals(self, codes: Optional[List[str]] = None) -> List[Dict]:
+        """获取交易信号，codes 为空时返回全部LOF"""
+        signals = self._load_trading_signals(codes)
+        # 更新时间不写入磁盘缓存，每次取用时重新标注
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for signal in signals:
+            signal['last_update'] = now
+        return signals
+    
+    def _load_trading_signals(self, codes: Optional[List[str]]) -> List[Dict]:
+        """数据未变化时直接读取磁盘缓存
+        缓存未命中时：指定了 codes 只读取并计算这些代码（不写缓存）；未指定则仍要读取全部CSV并写入缓存"""
+        cache_path = self._signals_cache_path()
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                signals = json.load(f)
+            if codes:
+                wanted = set(codes)
+                signals = [s for s in signals if s['code'] in wanted]
+            return signals
+        except (OSError, ValueError):
+            pass
+        
+        if codes:
+            return self._compute_trading_signals(codes)
+        
+        signals = self._compute_trading_signals(self.codes)
+        try:
+            os.makedirs(SIGNALS_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(signals, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+            self._cleanup_signals_cache(cache_path)
+        except OSError as e:
+            print(f"写入信号缓存失败: {e}")
+        return signals
+    
+    def _compute_trading_signals(self, codes: List[str]) -> List[Dict]:
+        """逐个代码生成交易信号并按溢价率绝对值排序"""
         signals = []
-        for code in self.lof_data.keys():
-            signal = self.get_trading_signal(code)
+        for code, stats in self._batch_window_stats(codes).items():
+            signal = self._build_signal(code, stats)
             if signal:
                 signals.append(signal)
         return sorted(signals, key=lambda x: abs(x['current_premium']), reverse=True)
 
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_analyzer(data_dir: str, version) -> PremiumAnalyzer:
+    """数据版本不变时复用已加载的分析器，不再每次重跑都读全部CSV；version 仅用作缓存键"""
+    return PremiumAnalyzer(data_dir)
+
 # Streamlit Dashboard
 def main():
     st_autorefresh(interval=5 * 60 * 1000, key="auto_refresh") # ✅ 5min自动刷新（最先执行）
-    st.cache_data.clear()   # 👈 强制每次重算
     st.set_page_config(
         page_title="LOF溢价率交易仪表板",
         page_icon="📈",
@@ -141,12 +296,12 @@ def main():
     st.title("📈 LOF溢价率交易仪表板")
     st.markdown("### 基于历史数据的交易信号分析")
     
-    analyzer = PremiumAnalyzer()
+    analyzer = get_analyzer("data", dataset_version("data"))
     
     # 侧边栏
     with st.sidebar:
         st.header("🔧 设置")
-        all_codes = list(analyzer.lof_data.keys())
+        all_codes = analyzer.codes
         selected_codes = st.multiselect(
             "选择LOF代码",
             options=all_codes,
@@ -159,15 +314,11 @@ def main():
     with col1:
         st.header("🎯 交易信号")
         
-        # 获取所有交易信号
-        all_signals = analyzer.get_all_trading_signals()
-        
-        # 筛选选中的代码
+        # 只取选中代码的交易信号，缓存未命中时也只读取这些代码；未选择时取全部
+        filtered_signals = analyzer.get_all_trading_signals(selected_codes)
         if not selected_codes:
-            filtered_signals = all_signals
             st.info(f"显示所有 {len(filtered_signals)} 个LOF的交易信号")
         else:
-            filtered_signals = [s for s in all_signals if s['code'] in selected_codes]
             st.info(f"显示选中的 {len(filtered_signals)} 个LOF的交易信号")
         
         if filtered_signals:
@@ -248,49 +399,55 @@ def main():
             show_14d = st.checkbox("14日均线", value=True, key="chart_14d")
             show_21d = st.checkbox("21日均线", value=False, key="chart_21d")
         
-        if selected_code in analyzer.lof_data:
-            df = analyzer.lof_data[selected_code]
-            if pd.isna(df['discount_rt'].iloc[-1]):
-                df['discount_rt'].iloc[-1] = round((df['price'].iloc[-1]/df['est_val'].iloc[-1]-1)*100,2)
+        df = analyzer.get_data(selected_code)
+        if df is not None:
+            # 分析器跨会话共享，浅拷贝后再添加均线列，不改动缓存中的数据
+            df = df.copy(deep=False)
             
+            chart_x = downsample(df['price_dt'])
+            # 折线用 WebGL 绘制，只在最近几天画点
+            n = len(chart_x)
+            marker = dict(size=np.where(np.arange(n) >= n - MARKER_TAIL, 6, 0))
             fig = go.Figure()
             
             if chart_type == "溢价率":
+                discount_mas = rolling_means(df['discount_rt'])
                 # 溢价率曲线
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt'],
-                    y=df['discount_rt'],
+                fig.add_trace(go.Scattergl(
+                    x=chart_x,
+                    y=downsample(df['discount_rt']),
                     mode='lines+markers',
+                    marker=marker,
                     name='溢价率',
                     line=dict(color='blue', width=2)
                 ))
                 
                 # 根据checkbox显示均线
                 if show_7d:
-                    df['ma7'] = df['discount_rt'].rolling(window=7).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['ma7'],
+                    df['ma7'] = discount_mas[7]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['ma7']),
                         mode='lines',
                         name='7日均线',
                         line=dict(color='red', width=1, dash='dash')
                     ))
                 
                 if show_14d:
-                    df['ma14'] = df['discount_rt'].rolling(window=14).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['ma14'],
+                    df['ma14'] = discount_mas[14]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['ma14']),
                         mode='lines',
                         name='14日均线',
                         line=dict(color='green', width=1, dash='dash')
                     ))
                 
                 if show_21d:
-                    df['ma21'] = df['discount_rt'].rolling(window=21).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['ma21'],
+                    df['ma21'] = discount_mas[21]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['ma21']),
                         mode='lines',
                         name='21日均线',
                         line=dict(color='orange', width=1, dash='dash')
@@ -304,41 +461,43 @@ def main():
                 )
                 
             elif chart_type == "价格":
+                price_mas = rolling_means(df['price'])
                 # 价格曲线
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt'],
-                    y=df['price'],
+                fig.add_trace(go.Scattergl(
+                    x=chart_x,
+                    y=downsample(df['price']),
                     mode='lines+markers',
+                    marker=marker,
                     name='收盘价',
                     line=dict(color='orange', width=2)
                 ))
                 
                 # 根据checkbox显示价格均线
                 if show_7d:
-                    df['price_ma7'] = df['price'].rolling(window=7).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['price_ma7'],
+                    df['price_ma7'] = price_mas[7]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['price_ma7']),
                         mode='lines',
                         name='价格7日均线',
                         line=dict(color='purple', width=1, dash='dash')
                     ))
                 
                 if show_14d:
-                    df['price_ma14'] = df['price'].rolling(window=14).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['price_ma14'],
+                    df['price_ma14'] = price_mas[14]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['price_ma14']),
                         mode='lines',
                         name='价格14日均线',
                         line=dict(color='brown', width=1, dash='dash')
                     ))
                 
                 if show_21d:
-                    df['price_ma21'] = df['price'].rolling(window=21).mean()
-                    fig.add_trace(go.Scatter(
-                        x=df['price_dt'],
-                        y=df['price_ma21'],
+                    df['price_ma21'] = price_mas[21]
+                    fig.add_trace(go.Scattergl(
+                        x=chart_x,
+                        y=downsample(df['price_ma21']),
                         mode='lines',
                         name='价格21日均线',
                         line=dict(color='pink', width=1, dash='dash')
@@ -355,20 +514,22 @@ def main():
                 fig = go.Figure()
                 
                 # 价格轴 (左)
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt'],
-                    y=df['price'],
+                fig.add_trace(go.Scattergl(
+                    x=chart_x,
+                    y=downsample(df['price']),
                     mode='lines+markers',
+                    marker=marker,
                     name='收盘价',
                     line=dict(color='orange', width=2),
                     yaxis='y'
                 ))
                 
                 # 溢价率轴 (右)
-                fig.add_trace(go.Scatter(
-                    x=df['price_dt'],
-                    y=df['discount_rt'],
+                fig.add_trace(go.Scattergl(
+                    x=chart_x,
+                    y=downsample(df['discount_rt']),
                     mode='lines+markers',
+                    marker=marker,
                     name='溢价率',
                     line=dict(color='blue', width=2),
                     yaxis='y2'
@@ -393,13 +554,20 @@ def main():
             
             # 数据表格显示
             with st.expander("📊 详细数据"):
-                display_df = df[['fund_id','price_dt','price','net_value','est_val','discount_rt','volume','amount','amount_incr']].copy()
-                display_df["price_dt"] = display_df["price_dt"].dt.strftime("%Y-%m-%d")
-                display_df['涨跌幅(%)'] = (display_df["price"].pct_change()*100).apply(lambda x: format(x,'.2f'))
-                display_df = display_df[['fund_id','price_dt','price','net_value','est_val','discount_rt','涨跌幅(%)','volume','amount','amount_incr']]
+                # 只处理最近 11 行（多 1 行用于算首行涨跌幅），不再对全部历史做 pct_change 与逐行格式化
+                display_df = df[['fund_id','price_dt','price','net_value','est_val','discount_rt','volume','amount','amount_incr']].tail(11)
+                display_df = display_df.assign(
+                    price_dt=display_df["price_dt"].dt.strftime("%Y-%m-%d"),
+                    pct=display_df["price"].pct_change() * 100
+                ).tail(10)
+                display_df = display_df[['fund_id','price_dt','price','net_value','est_val','discount_rt','pct','volume','amount','amount_incr']]
                 display_df.columns = ['代码', '交易日期', '现价', '基金净值', '实时估值', '溢价率(%)', '涨跌幅(%)','成交(万元)','场内份额(万份)','场内新增(万份)']
                 
-                st.dataframe(display_df.tail(10), use_container_width=True)
+                st.dataframe(
+                    display_df,
+                    use_container_width=True,
+                    column_config={'涨跌幅(%)': st.column_config.NumberColumn(format="%.2f")}
+                )
 
 # Ensure Streamlit runs the main function
 main()
\ No newline at end of file
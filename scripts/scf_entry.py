@@ -1,7 +1,21 @@
-import http.client
-import json
 import os  # 引入 os 模块，用于读取环境变量
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 模块级会话：云函数容器热启动时复用 TLS 连接；GitHub 偶发 5xx 自动退避重试
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset(['POST'])  # 默认不重试 POST，dispatch 需显式放开
+    )
+))
+
 def main_handler(event, context):
     # 1. 从环境变量中安全读取 GitHub Token
     github_token = os.environ.get('GITHUB_TOKEN')
@@ -18,24 +32,25 @@ def main_handler(event, context):
     workflow_file = "sync_daily.yml" # 工作流文件名，如 main.yml
     
     # 4. 构建 API 请求
-    conn = http.client.HTTPSConnection("api.github.com")
     headers = {
         "Authorization": f"token {github_token}",  # 使用从环境变量读取的Token
         "Accept": "application/vnd.github.v3+json",
         "User-Agent": "Tencent-SCF-Trigger"
     }
-    payload = json.dumps({"ref": "main"}).encode('utf-8')
     
     # 5. 发送 POST 请求以触发工作流
-    api_url = f"/repos/{owner}/{repo}/actions/workflows/{workflow_file}/dispatches"
-    conn.request("POST", api_url, body=payload, headers=headers)
-    
-    response = conn.getresponse()
+    api_url = f"https://api.github.com/repos/{owner}/{repo}/actions/workflows/{workflow_file}/dispatches"
+    try:
+        response = SESSION.post(api_url, json={"ref": "main"}, headers=headers, timeout=5)
+    except requests.RequestException as e:
+        error_msg = f"Failed to trigger workflow: {e}"
+        print(error_msg)
+        return {"error": error_msg}
     
-    if response.status == 204:
+    if response.status_code == 204:
         return "GitHub Actions workflow triggered successfully!"
     else:
-        error_msg = f"Failed to trigger workflow. Status: {response.status}, Response: {response.read().decode()}"
+        error_msg = f"Failed to trigger workflow. Status: {response.status_code}, Response: {response.text}"
         print(error_msg)
         # 注意：返回错误信息时，不要包含敏感的 Token
         return {"error": error_msg}
@@ -9,10 +9,6 @@ import argparse
 # 添加路径以便导入模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from datetime import datetime
-from utils.trading_calendar import is_trading_day
-from core.data_sync import DataSyncCore
-from utils.data_manager import DataManager
-from fetch_fund_purchase import fetch_or_load_fund_purchase
 from zoneinfo import ZoneInfo
 
 def write_last_update_time():
@@ -25,10 +21,29 @@ def write_last_update_time():
     now_cn = datetime.now(ZoneInfo("Asia/Shanghai"))
     now_str = now_cn.strftime("%Y-%m-%d %H:%M")
 
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(now_str)
+    # 先写临时文件再原子替换，中途失败不会留下截断的文件
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(now_str.encode("utf-8"))
+    os.replace(tmp_path, path)
         
-def main():
+def summarize_results(results) -> tuple:
+    """(更新数, 总数, 新增记录数)，一次取出各列表"""
+    updated_list = results['updated']
+    total = len(updated_list) + len(results['no_change']) + len(results['failed'])
+    return len(updated_list), total, sum(r['new'] for r in updated_list)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="LOF每日数据同步")
+    parser.add_argument("--init", action="store_true", help="首次初始化数据")
+    parser.add_argument("--code", type=str, help="指定单个LOF代码")
+    parser.add_argument("--verify", action="store_true", help="验证数据完整性")
+    return parser
+
+def main(argv=None):
+    """argv 为 None 时（被云函数等导入调用）按默认增量同步处理，不读取宿主进程的 sys.argv"""
+    # 重量级依赖（pandas、akshare 等）放到函数内按需导入，非交易日尽快退出
+    from utils.trading_calendar import is_trading_day
 
     # ===== 交易日判断=====
     if not is_trading_day(datetime.now(ZoneInfo("Asia/Shanghai")).date()):
@@ -37,24 +52,21 @@ def main():
 
     print("📈 交易日，开始同步数据...")
 
+    from core.data_sync import DataSyncCore
+    from utils.data_manager import DataManager
+    from fetch_fund_purchase import fetch_or_load_fund_purchase
+
     fetch_or_load_fund_purchase() # 同步申购赎回信息
 
-    parser = argparse.ArgumentParser(description="LOF每日数据同步")
-    parser.add_argument("--init", action="store_true", help="首次初始化数据")
-    parser.add_argument("--code", type=str, help="指定单个LOF代码")
-    parser.add_argument("--verify", action="store_true", help="验证数据完整性")
-    
-    args = parser.parse_args()
+    # 参数在交易日判断之后才解析，非交易日不构建解析器
+    args = build_parser().parse_args([] if argv is None else argv)
     
     syncer = DataSyncCore()
     manager = DataManager()
     
     if args.init:
         print("🚀 首次数据初始化...")
-        results = syncer.sync_all()
-        
-        updated = len(results['updated'])
-        total = len(results['updated']) + len(results['no_change']) + len(results['failed'])
+        updated, total, _ = summarize_results(syncer.sync_all())
         
         print(f"✅ 初始化完成: {updated}/{total} 个LOF已更新")
         return
@@ -78,11 +90,7 @@ def main():
     
     # 默认：执行增量同步
     print("🔄 执行增量数据同步...")
-    results = syncer.sync_all()
-    
-    updated = len(results['updated'])
-    total = len(results['updated']) + len(results['no_change']) + len(results['failed'])
-    new_records = sum(r['new'] for r in results['updated'])
+    updated, total, new_records = summarize_results(syncer.sync_all())
     
     print(f"✅ 同步完成: {updated}/{total} 个LOF更新, 新增{new_records}条记录")
 
@@ -90,4 +98,4 @@ def main():
     print("🕒 已记录最后同步时间")
         
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
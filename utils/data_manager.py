@@ -2,11 +2,13 @@
 数据管理工具
 处理数据的保存、加载、验证和清理
 """
+import numpy as np
 import pandas as pd
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Any, Dict, Iterable, List, Tuple
 
 class DataManager:
     """数据管理器"""
@@ -14,47 +16,90 @@ class DataManager:
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
         os.makedirs(data_dir, exist_ok=True)
+        # 汇总缓存放在数据目录同级的 .cache/ 下，不随 data/ 提交；文件名带目录名，同级的多个数据目录互不覆盖
+        abs_dir = os.path.abspath(data_dir)
+        self.summary_cache_path = os.path.join(
+            os.path.dirname(abs_dir), ".cache", f"summary_cache_{os.path.basename(abs_dir)}.json"
+        )
+    
+    def _path(self, code: str) -> str:
+        """LOF数据文件路径；存储保持 CSV，与同步任务、仪表板及 git 同步的数据文件一致"""
+        return os.path.join(self.data_dir, f"lof_{code}.csv")
     
     def save_lof_data(self, code: str, df: pd.DataFrame) -> bool:
         """保存LOF数据"""
         try:
-            filename = f"{self.data_dir}/lof_{code}.csv"
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            filename = self._path(code)
+            # 溢价率统一存为数值，T日未确认的 "-" 与同步任务一样存为空值
+            if 'discount_rt' in df.columns:
+                df = df.assign(discount_rt=pd.to_numeric(df['discount_rt'], errors='coerce'))
+            # 纯数值/ASCII 内容，不写 BOM；各读取方（pandas、lof_io）有无 BOM 都能正确解析
+            df.to_csv(filename, index=False, encoding='utf-8')
             return True
         except Exception as e:
             print(f"❌ 保存 {code} 失败: {e}")
             return False
     
+    def save_many(self, items: Iterable[Tuple[str, pd.DataFrame]], max_workers: int = 8) -> Dict[str, bool]:
+        """批量保存 (代码, 数据)，各文件相互独立，多线程并行写入；返回 代码 -> 是否成功"""
+        items = list(items)
+        if not items:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return dict(zip(
+                (code for code, _ in items),
+                pool.map(lambda item: self.save_lof_data(*item), items)
+            ))
+    
     def load_lof_data(self, code: str) -> pd.DataFrame:
         """加载LOF数据"""
-        filename = f"{self.data_dir}/lof_{code}.csv"
-        if os.path.exists(filename):
-            try:
-                df = pd.read_csv(filename)
-                df['price_dt'] = pd.to_datetime(df['price_dt'])
-                return df
-            except Exception as e:
-                print(f"❌ 加载 {code} 失败: {e}")
+        filename = self._path(code)
+        try:
+            # 日期在 C 解析阶段直接转换，不再对整列字符串二次解析
+            # 旧文件中的 "-" 读作缺失值，溢价率列始终为 float64
+            return pd.read_csv(filename, parse_dates=['price_dt'], na_values=['-'], engine='c')
+        except FileNotFoundError:
+            # 直接打开，文件不存在时由异常返回空表，省去一次 exists 检查
+            pass
+        except Exception as e:
+            print(f"❌ 加载 {code} 失败: {e}")
         return pd.DataFrame()
     
     def get_data_summary(self) -> Dict[str, Any]:
         """获取数据汇总"""
-        files = [f for f in os.listdir(self.data_dir) if f.startswith('lof_') and f.endswith('.csv')]
+        with os.scandir(self.data_dir) as it:
+            files = [e for e in it if e.name[:4] == 'lof_' and e.name[-4:] == '.csv' and e.is_file()]
+        
+        # 文件名 -> [mtime_ns, 大小, 行数, 最新日期]；stat 未变的文件直接复用，不再解析
+        cache = self._load_summary_cache()
+        stats = {e.name: e.stat() for e in files}
+        stale = [
+            e for e in files
+            if cache.get(e.name, [None, None])[:2] != [stats[e.name].st_mtime_ns, stats[e.name].st_size]
+        ]
+        
+        # C 解析器读文件时释放 GIL，多线程并行读取
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(8, len(stale))) as pool:
+                for entry, result in zip(stale, pool.map(self._summarize_file, [e.path for e in stale])):
+                    st = stats[entry.name]
+                    cache[entry.name] = [st.st_mtime_ns, st.st_size, *(result or (None, None))]
         
         total_records = 0
         latest_dates = {}
         missing_lofs = []
         
-        for file in files:
-            code = file.replace('lof_', '').replace('.csv', '')
-            try:
-                df = pd.read_csv(f"{self.data_dir}/{file}")
-                total_records += len(df)
-                if 'price_dt' in df.columns:
-                    df['price_dt'] = pd.to_datetime(df['price_dt'])
-                    latest_dates[code] = df['price_dt'].max().strftime('%Y-%m-%d')
-            except Exception:
+        for entry in files:
+            code = entry.name[4:-4]
+            _, _, nrows, latest = cache[entry.name]
+            if nrows is None:
                 missing_lofs.append(code)
+                continue
+            total_records += nrows
+            latest_dates[code] = latest
+        
+        if stale or len(cache) != len(files):
+            self._save_summary_cache({e.name: cache[e.name] for e in files})
         
         return {
             'total_lofs': len(files),
@@ -63,6 +108,39 @@ class DataManager:
             'missing_lofs': missing_lofs
         }
     
+    def _load_summary_cache(self) -> Dict[str, list]:
+        try:
+            with open(self.summary_cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_summary_cache(self, cache: Dict[str, list]) -> None:
+        """原子写入，中途失败不会留下半个文件"""
+        try:
+            os.makedirs(os.path.dirname(self.summary_cache_path), exist_ok=True)
+            tmp_path = f"{self.summary_cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.summary_cache_path)
+        except OSError as e:
+            print(f"❌ 写入汇总缓存失败: {e}")
+    
+    @staticmethod
+    def _latest_date(dates: pd.Series) -> pd.Timestamp:
+        """按日期追加写入的文件已有序，最后一行即最新日期；无序时才整列求最大值"""
+        return dates.iat[-1] if dates.is_monotonic_increasing else dates.max()
+    
+    @staticmethod
+    def _summarize_file(path: str):
+        """单个文件的 (行数, 最新日期)，读取失败返回 None"""
+        try:
+            # 只解析日期一列，行数与最新日期都由它得出
+            df = pd.read_csv(path, usecols=['price_dt'], parse_dates=['price_dt'], engine='c')
+            return len(df), DataManager._latest_date(df['price_dt']).strftime('%Y-%m-%d')
+        except Exception:
+            return None
+    
     def validate_data(self, code: str) -> Dict[str, Any]:
         """验证数据完整性"""
         df = self.load_lof_data(code)
@@ -71,23 +149,20 @@ class DataManager:
         
         issues = []
         
-        # 检查缺失值
-        missing_discount = df['discount_rt'].isna().sum()
+        # 检查缺失值（T日未确认的 "-" 读取时已记为缺失，一并统计）
+        missing_discount = np.count_nonzero(pd.isna(df['discount_rt'].to_numpy()))
         if missing_discount > 0:
             issues.append(f"缺失溢价率: {missing_discount}条")
         
-        # 检查T日未确认数据
-        t_minus = (df['discount_rt'] == "-").sum()
-        if t_minus > 0:
-            issues.append(f"T日未确认: {t_minus}条")
-        
-        # 检查日期排序
-        if not df['price_dt'].is_monotonic_increasing:
+        # 检查日期排序；有序时最新日期直接取最后一行
+        is_sorted = df['price_dt'].is_monotonic_increasing
+        if not is_sorted:
             issues.append("日期未排序")
+        latest = df['price_dt'].iat[-1] if is_sorted else df['price_dt'].max()
         
         return {
             'valid': len(issues) == 0,
             'records': len(df),
-            'latest_date': df['price_dt'].max().strftime('%Y-%m-%d') if not df.empty else None,
+            'latest_date': latest.strftime('%Y-%m-%d'),
             'issues': issues
         }
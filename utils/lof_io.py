@@ -0,0 +1,155 @@
+"""
+LOF 数据读取
+TradingFramework 与仪表板共用的 CSV 解析、列式（SoA）存储和趋势图抽样
+"""
+import io
+import os
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 成交/份额类字段精度要求低，解析时直接降为 float32
+FLOAT32_COLUMNS = ('volume', 'amount', 'amount_incr')
+
+# 数值列统一在 C 解析阶段确定类型，"-" 视为缺失
+# 价格、净值与溢价率保持 float64：float32 的 0.7 实为 0.69999999，评分中 int(溢价率*10) 会从 7 变成 6
+NUMERIC_DTYPES = {
+    'price': 'float64',
+    'net_value': 'float64',
+    'est_val': 'float64',
+    'discount_rt': 'float64',
+    'volume': 'float32',
+    'amount': 'float32',
+    'amount_incr': 'float32'
+}
+
+# 列数组默认包含的列
+SOA_COLUMNS = ['price_dt', 'discount_rt', 'price', 'volume', 'amount', 'amount_incr']
+
+# 趋势图最多绘制的点数，超出时等间隔抽样
+MAX_CHART_POINTS = 1500
+
+# 趋势图只给最近几个点画标记
+MARKER_TAIL = 5
+
+def downsample(data, max_points: int = MAX_CHART_POINTS):
+    """等间隔抽样到不超过 max_points 个点，并保证保留最新一个点；均线应在抽样前计算"""
+    n = len(data)
+    if n <= max_points:
+        return data
+    step = -(-n // max_points)
+    return data.iloc[(n - 1) % step::step]
+
+def iter_lof_files(data_dir: str) -> Iterator[Tuple[str, str, float]]:
+    """遍历 lof_*.csv，返回 (代码, 路径, 修改时间)"""
+    for entry in os.scandir(data_dir):
+        # 直接切片取代码，避免 replace 误删代码中间的 "lof_"/".csv"
+        if entry.name[:4] == 'lof_' and entry.name[-4:] == '.csv' and entry.is_file():
+            yield entry.name[4:-4], entry.path, entry.stat().st_mtime
+
+# 增量读取缓存：(路径, 列) -> (mtime_ns, 文件大小, 最后一行原始字节, 表头, DataFrame)，按最近使用淘汰
+_FILE_CACHE = {}
+
+# 增量读取缓存的条目上限，约为两种列组合 × 全部LOF文件
+FILE_CACHE_MAX = 1024
+
+def _parse_csv(source, usecols: List[str], **kwargs) -> pd.DataFrame:
+    return pd.read_csv(
+        source,
+        usecols=usecols,
+        dtype={col: NUMERIC_DTYPES[col] for col in usecols if col in NUMERIC_DTYPES},
+        na_values=['-'],
+        parse_dates=['price_dt'],
+        engine='c',
+        **kwargs
+    )
+
+def read_lof_csv(file_path: str, usecols: List[str]) -> pd.DataFrame:
+    """只读指定列并按日期排序"""
+    df = _parse_csv(file_path, usecols)
+    # 按日期追加写入的文件通常已有序，O(N) 检查后可省去排序
+    if not df['price_dt'].is_monotonic_increasing:
+        df = df.sort_values('price_dt')
+    return df
+
+def _last_line(data: bytes) -> bytes:
+    """末尾一行的原始字节（含换行符）；data 不含其他换行时即整段"""
+    return data[data.rfind(b'\n', 0, len(data) - 1) + 1:]
+
+def _store_file_cache(key, entry) -> None:
+    """写入缓存；超出上限时先清掉已删除文件的条目，再淘汰最久未用的"""
+    _FILE_CACHE.pop(key, None)
+    _FILE_CACHE[key] = entry
+    if len(_FILE_CACHE) > FILE_CACHE_MAX:
+        for stale in [k for k in _FILE_CACHE if not os.path.exists(k[0])]:
+            del _FILE_CACHE[stale]
+        while len(_FILE_CACHE) > FILE_CACHE_MAX:
+            del _FILE_CACHE[next(iter(_FILE_CACHE))]
+
+def read_lof_csv_incremental(file_path: str, usecols: List[str]) -> pd.DataFrame:
+    """同 read_lof_csv，但在进程内缓存解析结果：
+    文件未变化直接返回；仅在末尾追加了行时只读取并解析新增部分；其余情况整体重读
+    返回的 DataFrame 为共享对象，调用方不要原地修改"""
+    key = (file_path, tuple(usecols))
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        _FILE_CACHE.pop(key, None)
+        raise
+    cached = _FILE_CACHE.get(key)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        _store_file_cache(key, cached)
+        return cached[4]
+
+    if cached and stat.st_size > cached[1] and cached[2][-1:] == b'\n':
+        size, last = cached[1], cached[2]
+        with open(file_path, 'rb') as f:
+            # 原末行字节未变即视为只在末尾追加，只读取原末行及之后的新内容
+            f.seek(size - len(last))
+            new = f.read() if f.read(len(last)) == last else b''
+            if new:
+                header = cached[3]
+                tail = _parse_csv(io.BytesIO(new), usecols, header=None, names=header)
+                df = pd.concat([cached[4], tail[cached[4].columns]], ignore_index=True)
+                if not df['price_dt'].is_monotonic_increasing:
+                    df = df.sort_values('price_dt', ignore_index=True)
+                _store_file_cache(key, (stat.st_mtime_ns, size + len(new), _last_line(new), header, df))
+                return df
+
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    header = pd.read_csv(io.BytesIO(raw), nrows=0).columns.tolist()
+    df = read_lof_csv(io.BytesIO(raw), usecols)
+    _store_file_cache(key, (stat.st_mtime_ns, len(raw), _last_line(raw), header, df))
+    return df
+
+def to_soa(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """已排序的 DataFrame 转为列数组，price_dt 存为 int64 纳秒"""
+    cols = {'dt': df['price_dt'].to_numpy(dtype='datetime64[ns]').astype(np.int64)}
+    for col in df.columns:
+        if col in NUMERIC_DTYPES or col == 'price_pct':
+            dtype = np.float32 if col in FLOAT32_COLUMNS else np.float64
+            cols[col] = df[col].to_numpy(dtype=dtype)
+    return cols
+
+def data_version(data_dir: str) -> Tuple[int, float]:
+    """(文件数, 最新修改时间)，作为缓存键，数据文件有增删改时才变化"""
+    mtimes = [mtime for _, _, mtime in iter_lof_files(data_dir)]
+    return len(mtimes), max(mtimes, default=0.0)
+
+@lru_cache(maxsize=1)
+def load_soa(data_dir: str, version: Tuple[int, float]) -> Dict[str, Dict[str, np.ndarray]]:
+    """加载全部LOF的列数组；version 仅用作缓存键"""
+    lof_cols = {}
+    for code, file_path, _ in iter_lof_files(data_dir):
+        try:
+            lof_cols[code] = to_soa(read_lof_csv_incremental(file_path, SOA_COLUMNS))
+        except Exception as e:
+            print(f"❌ 加载 {code} 失败: {e}")
+    return lof_cols
+
+def load_all_codes(data_dir: str = "data") -> Dict[str, Dict[str, np.ndarray]]:
+    """同一进程内共享一次解析结果，数据未变化时直接复用"""
+    return load_soa(data_dir, data_version(data_dir))
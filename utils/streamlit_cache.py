@@ -0,0 +1,12 @@
+"""
+仪表板共用的 Streamlit 缓存
+单独成模块，lof_io 仍可在不安装 streamlit 的环境中使用
+"""
+import streamlit as st
+
+from utils.lof_io import data_version
+
+@st.cache_data(ttl=300, show_spinner=False)
+def dataset_version(data_dir: str):
+    """数据目录版本 (文件数, 最新修改时间)，与自动刷新同频每5分钟检查一次"""
+    return data_version(data_dir)
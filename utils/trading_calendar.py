@@ -1,20 +1,52 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import logging
 from zoneinfo import ZoneInfo
-import pandas as pd
 import pandas_market_calendars as mcal
 
+__all__ = ['is_trading_day', 'today_cn']
+
+logger = logging.getLogger(__name__)
+
 # 上交所交易日历
 _sse = mcal.get_calendar('SSE')
 
+# 预先展开为交易日集合的日期范围，范围外退回逐日查询
+_RANGE_START = date(2015, 1, 1)
+_RANGE_END = date(2035, 12, 31)
+
 def today_cn() -> date:
     return datetime.now(ZoneInfo("Asia/Shanghai")).date()
 
+@lru_cache(maxsize=1)
+def _trading_ordinals() -> frozenset:
+    """范围内全部交易日的日期序号，首次查询时一次生成"""
+    days = _sse.valid_days(
+        start_date=_RANGE_START.strftime("%Y-%m-%d"),
+        end_date=_RANGE_END.strftime("%Y-%m-%d")
+    )
+    return frozenset(d.toordinal() for d in days.date)
+
+@lru_cache(maxsize=4096)
+def _is_trading_day_ord(ordinal: int) -> bool:
+    """按日期序号缓存查询结果，同一天只调用一次 schedule"""
+    day = date.fromordinal(ordinal).strftime("%Y-%m-%d")
+    schedule = _sse.schedule(start_date=day, end_date=day)
+    return not schedule.empty
+
 def is_trading_day(dt: date = None) -> bool:
     if dt is None:
         dt = today_cn()
 
-    schedule = _sse.schedule(
-        start_date=dt.strftime("%Y-%m-%d"),
-        end_date=dt.strftime("%Y-%m-%d")
-    )
-    return not schedule.empty
+    ordinal = dt.toordinal()
+    if _RANGE_START.toordinal() <= ordinal <= _RANGE_END.toordinal():
+        return ordinal in _trading_ordinals()
+    return _is_trading_day_ord(ordinal)
+
+# 导入时预热：交易日集合在云函数初始化阶段生成，容器复用时今日与昨日的查询都直接命中
+# 预热失败不影响导入，但记录异常，日历安装有问题时能在日志中直接看到
+try:
+    is_trading_day(today_cn())
+    is_trading_day(today_cn() - timedelta(days=1))
+except Exception:
+    logger.exception("交易日历预热失败")